@@ -1,202 +1,104 @@
 import streamlit as st
 import numpy as np
-import matplotlib.pyplot as plt
-import requests
 import pandas as pd
-import plotly.express as px 
 import plotly.graph_objects as go
-import yfinance as yf
-from datetime import datetime
-from scipy.stats import norm
+import os
+
+# Computation lives in the headless options_engine package; its modules are imported on
+# first use, so the Monte Carlo and batch code is only loaded once the page needs it
+import options_engine as engine
 
 # Function definitions
-@st.cache_data(ttl=300)
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Provider and cache location are configured through the environment:
+# MARKET_DATA_PROVIDER ('yahoo' or 'offline'), MARKET_DATA_CACHE and MARKET_DATA_FIXTURES
+@st.cache_resource
+def get_market_data_store():
+    if os.environ.get('MARKET_DATA_PROVIDER', 'yahoo') == 'offline':
+        provider = engine.OfflineProvider(os.environ.get('MARKET_DATA_FIXTURES', os.path.join(APP_DIR, 'fixtures', 'market_data')))
+    else:
+        provider = engine.YahooFinanceProvider()
+    return engine.MarketDataStore(os.environ.get('MARKET_DATA_CACHE', os.path.join(APP_DIR, '.cache', 'market_data.sqlite')), provider,
+                                  refresh_seconds=float(os.environ.get('MARKET_DATA_REFRESH_SECONDS', 300)))
+
+# Warm-up concurrency, retries and schedule: MARKET_DATA_WORKERS, MARKET_DATA_RETRIES and
+# MARKET_DATA_REFRESH_SECONDS
+@st.cache_resource
+def get_market_data_warmer():
+    return engine.MarketDataWarmer(get_market_data_store(), engine.SYMBOLS,
+                                   max_workers=int(os.environ.get('MARKET_DATA_WORKERS', 4)),
+                                   retries=int(os.environ.get('MARKET_DATA_RETRIES', 2)),
+                                   refresh_seconds=float(os.environ.get('MARKET_DATA_REFRESH_SECONDS', 300))).start()
+
 def get_stock_data(symbols):
-    # Download historical market data from Yahoo Finance
-    stock_data = yf.download(symbols, period='6mo', interval='1d',progress= False)  
-    stock_data.reset_index(inplace=True)  
-    stock_data = stock_data[['Date', 'Open', 'High', 'Low', 'Close']]  
+    # Served from the warm-up cache; falls back to the store if the first pass hasn't reached this symbol yet
+    stock_data = get_market_data_warmer().get(symbols)
+    if stock_data is None:
+        start = pd.Timestamp.today().normalize() - pd.DateOffset(months=6)
+        stock_data = get_market_data_store().get_history(symbols, start)
     return stock_data
 
 def get_underlying_asset_price(symbols):
-    # Fetch the most recent closing price
-    stock_data = yf.download(symbols, period='5d', interval='1d',progress= False) 
-    most_recent_close = stock_data['Close'][-1]  # Get the most recent close price
+    # Most recent close from the local store; get_stock_data has already brought it up to date
+    most_recent_close = get_market_data_store().latest_close(symbols)
     return most_recent_close
-# Black-Scholes formula for Call option
-def black_scholes_call(S, K, T, r, sigma):
-    d1 = (np.log(S / K) + (r + 0.5 * sigma**2) * T) / (sigma * np.sqrt(T))
-    d2 = d1 - sigma * np.sqrt(T)
-    call_price = S * norm.cdf(d1) - K * np.exp(-r * T) * norm.cdf(d2)
-    return call_price
-def black_scholes_put(S, K, T, r, sigma):
-    # Black-Scholes formula for put option price
-    d1 = (np.log(S / K) + (r + 0.5 * sigma ** 2) * T) / (sigma * np.sqrt(T))
-    d2 = d1 - sigma * np.sqrt(T)
-    put_price = (K * np.exp(-r * T) * norm.cdf(-d2) - S * norm.cdf(-d1))
-    return put_price
-
-def calculate_call_payoff(asset_prices, strike_price, T, r, sigma, premium):
-    option_prices = [black_scholes_call(S, strike_price, T, r, sigma) for S in asset_prices]
-    payoffs = [option_price - premium for option_price in option_prices]
-    return payoffs
-
-def calculate_put_payoff(asset_prices, strike_price, T, r, sigma, premium):
-    option_prices = [black_scholes_put(S, strike_price, T, r, sigma) for S in asset_prices]
-    payoffs = [option_price - premium for option_price in option_prices]
-    return payoffs
-
-# Function to calculate the payoff for a straddle option
-def calculate_straddle_payoff(asset_prices, strike_price, T, r, sigma, premium_call, premium_put):
-    call_prices = [black_scholes_call(S, strike_price, T, r, sigma) for S in asset_prices]
-    put_prices = [black_scholes_put(S, strike_price, T, r, sigma) for S in asset_prices]
-    payoffs = [(call_price + put_price) - (premium_call + premium_put) for call_price, put_price in zip(call_prices, put_prices)]
-    
-    return payoffs
 
+# Volatility table built only from bars already in memory: the symbols the warmer holds plus
+# the selected one (which the page has loaded anyway). Symbols the first warm-up pass hasn't
+# reached yet get NaN rows instead of being fetched here, and fill in on a later rerun.
+def get_historical_volatility_table(window, selected_symbol):
+    warmer = get_market_data_warmer()
+    frames = {symbol: warmer.get(symbol) for symbol in engine.SYMBOLS}
+    frames[selected_symbol] = get_stock_data(selected_symbol)
+    frames = {symbol: frame for symbol, frame in frames.items() if frame is not None}
+    return compute_historical_volatility_table(frames, window).reindex(engine.SYMBOLS)
 
-def calculate_covered_call_payoff_bs(asset_prices, purchase_price, strike_price, T, r, sigma, premium):
-    call_option_prices = np.array([black_scholes_call(S, strike_price, T, r, sigma) for S in asset_prices])
-    long_asset_payoff = asset_prices - strike_price
-    short_call_payoff = premium - call_option_prices
-    payoffs = long_asset_payoff + short_call_payoff
-    
-    return payoffs
-
-def calculate_married_put_payoff_bs(asset_prices, purchase_price, strike_price, T, r, sigma, premium_paid):
-    put_option_prices = np.array([black_scholes_put(S, strike_price, T, r, sigma) for S in asset_prices])
-    stock_payoff = asset_prices - purchase_price
-    put_payoff = put_option_prices - premium_paid
-    payoffs = stock_payoff + put_payoff
-    return payoffs
-    
-def calculate_bull_call_spread_payoff_bs(asset_prices, strike_price_long_call, strike_price_short_call, T, r, sigma, premium_long_call, premium_short_call):
-    # Calculate call option prices using the Black-Scholes formula
-    long_call_prices = np.array([black_scholes_call(S, strike_price_long_call, T, r, sigma) for S in asset_prices])
-    short_call_prices = np.array([black_scholes_call(S, strike_price_short_call, T, r, sigma) for S in asset_prices])
-    
-    # Payoff from the long call position
-    long_call_payoff = long_call_prices - premium_long_call
-    # Payoff from the short call position (negative because it's short)
-    short_call_payoff = premium_short_call - short_call_prices
-    
-    # The bull call spread payoff is the sum of the long call and short call payoffs
-    bull_call_spread_payoff = long_call_payoff + short_call_payoff
-    return bull_call_spread_payoff
-
-# Function to calculate the payoff for a Bull Put Spread option
-def calculate_bull_put_spread_payoff_bs(asset_prices, strike_price_short_put, strike_price_long_put, T, r, sigma, premium_short_put, premium_long_put):
-    # Calculate put option prices using the Black-Scholes formula
-    short_put_prices = np.array([black_scholes_put(S, strike_price_short_put, T, r, sigma) for S in asset_prices])
-    long_put_prices = np.array([black_scholes_put(S, strike_price_long_put, T, r, sigma) for S in asset_prices])
-    
-    # Payoff from the short put position
-    short_put_payoff = premium_short_put - short_put_prices
-    # Payoff from the long put position (negative because we're buying it)
-    long_put_payoff = long_put_prices - premium_long_put
-    
-    # The bull put spread payoff is the sum of the short put and long put payoffs
-    bull_put_spread_payoff = short_put_payoff + long_put_payoff
-    return bull_put_spread_payoff
-# Function to calculate the payoff for a Protective Collar option
-def calculate_protective_collar_payoff_bs(asset_prices, purchase_price, strike_price_put, premium_put, strike_price_call, premium_call, T, r, sigma):
-    # Calculate put and call option prices using the Black-Scholes formula
-    put_prices = np.array([black_scholes_put(S, strike_price_put, T, r, sigma) for S in asset_prices])
-    call_prices = np.array([black_scholes_call(S, strike_price_call, T, r, sigma) for S in asset_prices])
-    premium_put = black_scholes_put(purchase_price, strike_price_put, T, r, sigma)
-    premium_call = black_scholes_call(purchase_price, strike_price_call, T, r, sigma)
-    # Profit or loss from holding the stock
-    stock_payoff = asset_prices - purchase_price
-    # Payoff from the long put position (using Black-Scholes put prices to reflect premiums)
-    long_put_payoff = np.maximum(strike_price_put - asset_prices, 0) - premium_put
-    # Payoff from the short call position (using Black-Scholes call prices to reflect premiums)
-    short_call_payoff = premium_call - np.maximum(asset_prices - strike_price_call, 0)
-    
-    # The protective collar payoff is the sum of the stock, put, and call payoffs
-    protective_collar_payoff = stock_payoff + long_put_payoff + short_call_payoff
-    return protective_collar_payoff
-# Function to calculate the payoff for a Long Call Butterfly Spread option
-def calculate_long_call_butterfly_payoff_bs(asset_prices, strike_price_low, strike_price_mid, strike_price_high, T, r, sigma, premium_low, premium_mid, premium_high):
-    # Calculate call option prices using the Black-Scholes formula
-    call_prices_low = np.array([black_scholes_call(S, strike_price_low, T, r, sigma) for S in asset_prices])
-    call_prices_mid = np.array([black_scholes_call(S, strike_price_mid, T, r, sigma) for S in asset_prices])
-    call_prices_high = np.array([black_scholes_call(S, strike_price_high, T, r, sigma) for S in asset_prices])
-    
-    # Payoff for buying one low strike call
-    long_call_low_payoff = call_prices_low - premium_low
-    # Payoff for selling two mid strike calls
-    short_call_mid_payoff = 2 * (premium_mid - call_prices_mid)
-    # Payoff for buying one high strike call
-    long_call_high_payoff = call_prices_high - premium_high
-
-    # Total payoff for the butterfly spread
-    butterfly_payoff = long_call_low_payoff + short_call_mid_payoff + long_call_high_payoff
-    return butterfly_payoff
-# Function to calculate the payoff for an Iron Butterfly option
-def calculate_iron_butterfly_payoff_bs(asset_prices, strike_price_atm, strike_price_otm_put, strike_price_otm_call, T, r, sigma, premium_atm, premium_otm_put, premium_otm_call):
-    # Calculate option prices using the Black-Scholes formula
-    call_price_atm = np.array([black_scholes_call(S, strike_price_atm, T, r, sigma) for S in asset_prices])
-    put_price_atm = np.array([black_scholes_put(S, strike_price_atm, T, r, sigma) for S in asset_prices])
-    call_price_otm_call = np.array([black_scholes_call(S, strike_price_otm_call, T, r, sigma) for S in asset_prices])
-    put_price_otm_put = np.array([black_scholes_put(S, strike_price_otm_put, T, r, sigma) for S in asset_prices])
-
-    # Payoff from the long out-of-the-money put
-    long_put_payoff = put_price_otm_put - premium_otm_put
-    # Payoff from the short at-the-money put
-    short_atm_put_payoff = premium_atm - put_price_atm
-    # Payoff from the short at-the-money call
-    short_atm_call_payoff = premium_atm - call_price_atm
-    # Payoff from the long out-of-the-money call
-    long_call_payoff = call_price_otm_call - premium_otm_call
-
-    # Total payoff for the Iron Butterfly
-    iron_butterfly_payoff = long_put_payoff + short_atm_put_payoff + short_atm_call_payoff + long_call_payoff
-    return iron_butterfly_payoff
-# Function to calculate the payoff for an Iron Condor option
-def calculate_iron_condor_payoff_bs(asset_prices, strike_price_put_buy, strike_price_put_sell, strike_price_call_buy, strike_price_call_sell, T, r, sigma, premium_put_buy, premium_put_sell, premium_call_buy, premium_call_sell):
-    # Calculate option prices using the Black-Scholes formula
-    put_price_buy = np.array([black_scholes_put(S, strike_price_put_buy, T, r, sigma) for S in asset_prices])
-    put_price_sell = np.array([black_scholes_put(S, strike_price_put_sell, T, r, sigma) for S in asset_prices])
-    call_price_buy = np.array([black_scholes_call(S, strike_price_call_buy, T, r, sigma) for S in asset_prices])
-    call_price_sell = np.array([black_scholes_call(S, strike_price_call_sell, T, r, sigma) for S in asset_prices])
-
-    # Payoff from the long put
-    long_put_payoff = put_price_buy - premium_put_buy
-    # Payoff from the short put
-    short_put_payoff = premium_put_sell - put_price_sell
-    # Payoff from the short call
-    short_call_payoff = premium_call_sell - call_price_sell
-    # Payoff from the long call
-    long_call_payoff = call_price_buy - premium_call_buy
-
-    # The iron condor payoff is the sum of the individual option payoffs
-    iron_condor_payoff = long_put_payoff + short_put_payoff + short_call_payoff + long_call_payoff
-    return iron_condor_payoff
+@st.cache_data(ttl=300)
+def compute_historical_volatility_table(frames, window):
+    return engine.historical_volatility_table(frames, window)
 
-# Streamlit app layout
-st.title('Options Strategy Visualizer')
+@st.cache_data(ttl=300)
+def get_backtest_history(symbol, years):
+    start = pd.Timestamp.today().normalize() - pd.DateOffset(years=years)
+    return get_market_data_store().get_history(symbol, start)
 
-# API data fetch
-symbols = ["AAPL", "MSFT", "GOOGL", "AMZN", "SPY", "QQQ", "DIA", "META", "NFLX", "NVDA", "TSLA", "AMD"]
-selected_symbol = st.selectbox("Select Stock Symbol", symbols)
+@st.cache_resource
+def get_figure_cache():
+    return engine.LRUCache(max_entries=64)
 
-# Display a placeholder for the most recent close price
-most_recent_close = 0.00
+@st.cache_resource
+def get_payoff_cache():
+    return engine.LRUCache(max_entries=512)
 
-if selected_symbol:
-    stock_data = get_stock_data(selected_symbol)
+# One timer per browser session
+def get_stage_timer():
+    if 'stage_timer' not in st.session_state:
+        st.session_state['stage_timer'] = engine.StageTimer()
+    return st.session_state['stage_timer']
+
+# Streamlit app layout
+# The page is split into fragments that rerun independently: the market data panel, the
+# strategy inputs and, nested inside those, the payoff chart, surface and Monte Carlo
+# panels. Editing a strategy input reruns only the strategy fragment, and changing a
+# chart option redraws only that chart.
+
+# Market data: candlestick chart and most recent close for the selected symbol
+@st.fragment
+def market_data_panel(selected_symbol):
+    timer = get_stage_timer()
+    with timer.stage('fetch', symbol=selected_symbol):
+        stock_data = get_stock_data(selected_symbol)
     
     if not stock_data.empty:
-        # Create and display the candlestick chart
-        fig_candlestick = go.Figure(data=[go.Candlestick(x=stock_data['Date'],
-                                                         open=stock_data['Open'],
-                                                         high=stock_data['High'],
-                                                         low=stock_data['Low'],
-                                                         close=stock_data['Close'])])
-        fig_candlestick.update_layout(title=f'Candlestick Chart for {selected_symbol}', xaxis_title='Date', yaxis_title='Price (USD)')
-        st.plotly_chart(fig_candlestick)
+        # Candlestick charts are cached per symbol and last bar, so reruns don't rebuild them
+        with timer.stage('render', chart='candlestick'):
+            fig_candlestick = get_figure_cache().get_or_create(
+                ('candlestick', selected_symbol, str(stock_data['Date'].iloc[-1]), len(stock_data)),
+                lambda: engine.candlestick_figure(selected_symbol, stock_data))
+            st.plotly_chart(fig_candlestick)
         
-        # Update and display the most recent adjusted close price
+        # Display the most recent adjusted close price
         most_recent_close = get_underlying_asset_price(selected_symbol)
         if most_recent_close is not None:
             st.write(f"Most recent adjusted close price for {selected_symbol}: ${most_recent_close:.2f}")
@@ -205,218 +107,336 @@ if selected_symbol:
     else:
             st.error(f"No data available for {selected_symbol}. Please try again later.")
 
-# Strategy selection
-strategy = st.selectbox("Select Strategy", ["Call", "Put", "Straddle", "Covered Call", "Married Put","Bull Call Spread","Bull Put Spread",
-                                            "Protective Collar","Long Call Butterfly Spread","Iron Butterfly","Iron Condor"])
-# Strategy parameters
-asset_price = st.number_input('Underlying Asset Price', value=most_recent_close, key=f'asset_price_{selected_symbol}')
-strike_price = st.number_input('Strike Price', value=int(round(asset_price, 0)), step=1, key=f'strike_{strategy}')
-premium = st.number_input('Premium',value=10.0, step = 0.01, key=f'premium_{strategy}')
-current_date = st.date_input('Current Date', key=f'current_{strategy}')
-expiration_date = st.date_input('Expiration Date', key=f'expiry_{strategy}')
-
-T = (expiration_date - current_date).days / 365  # Time to expiration in years
-r = 0.05  # Risk-free interest rate
-sigma = 0.25  # Volatility
-
-if strategy == "Covered Call":
-    purchase_price = st.number_input('Purchase Price of Underlying Asset', value= asset_price, key='purchase_price')
-elif strategy == "Married Put":
-    purchase_price = st.number_input('Purchase Price of Underlying Asset', value= asset_price, key='purchase_price')
-    premium_paid = st.number_input('Premium Paid for Put Option', value=10.0, key='premium_paid')
-elif strategy == "Straddle":
-    # Inputs for the Straddle strategy
-    strike_price = st.number_input('Strike Price for Both Call and Put', min_value=0, value = strike_price, key='strike_price_straddle')
-    premium_call = st.number_input('Premium Paid for Call Option', min_value=0.0, value=5.0, key='premium_call_straddle')
-    premium_put = st.number_input('Premium Paid for Put Option', min_value=0.0, value=5.0, key='premium_put_straddle')
-elif strategy == "Bull Call Spread":
-    # For Bull Call Spread, we need two strike prices and two premiums
-    strike_price_long_call = st.number_input('Strike Price for Long Call', min_value=0, value = strike_price, key='strike_price_long_call')
-    premium_long_call = st.number_input('Premium for Long Call', min_value=0.0, value=10.0, key='premium_long_call')
-    strike_price_short_call = st.number_input('Strike Price for Short Call', min_value=0, value = strike_price + 10, key='strike_price_short_call')
-    premium_short_call = st.number_input('Premium for Short Call', min_value=0.0, value=5.0, key='premium_short_call')
-elif strategy == "Bull Put Spread":
-    # For Bull Put Spread, we need two strike prices and two premiums
-    strike_price_short_put = st.number_input('Strike Price for Short Put', min_value=0, value=strike_price, key='strike_price_short_put')
-    premium_short_put = st.number_input('Premium for Short Put', min_value=0.0, value=10.0, key='premium_short_put')
-    strike_price_long_put = st.number_input('Strike Price for Long Put', min_value=0, value=strike_price - 10, key='strike_price_long_put')
-    premium_long_put = st.number_input('Premium for Long Put', min_value=0.0, value=5.0, key='premium_long_put')
-# Inputs specific to Protective Collar
-elif strategy == "Protective Collar":
-    purchase_price = st.number_input('Purchase Price of Underlying Asset', value=asset_price, key='purchase_price_collar')
-    strike_price_put = st.number_input('Strike Price for Long Put', min_value=0, value= strike_price -5, key='strike_price_put')
-    premium_put = st.number_input('Premium for Long Put', min_value=0.0, value=5.0, key='premium_put')
-    strike_price_call = st.number_input('Strike Price for Short Call', min_value=0, value= strike_price + 10, key='strike_price_call')
-    premium_call = st.number_input('Premium for Short Call', min_value=0.0, value=5.0, key='premium_call')
-elif strategy == "Long Call Butterfly Spread":
-    # For Long Call Butterfly Spread, we need three strike prices and three premiums
-    strike_price_low = st.number_input('Strike Price for Low Call', min_value=0, value=strike_price - 10, key='strike_price_low')
-    premium_low = st.number_input('Premium for Low Call', min_value=0.0, value=3.0, key='premium_low')
-    strike_price_mid = st.number_input('Strike Price for Mid Call', min_value=0, value=strike_price, key='strike_price_mid')
-    premium_mid = st.number_input('Premium for Mid Call', min_value=0.0, value=4.0, key='premium_mid')
-    strike_price_high = st.number_input('Strike Price for High Call', min_value=0, value=strike_price + 10, key='strike_price_high')
-    premium_high = st.number_input('Premium for High Call', min_value=0.0, value=8.0, key='premium_high')
-# Inputs specific to Iron Butterfly
-elif strategy == "Iron Butterfly":
-    # For an Iron Butterfly, we need the strike price and premiums for the ATM options and the OTM put and call
-    strike_price_atm = st.number_input('Strike Price for ATM Options', min_value=0, value=strike_price, key='strike_price_atm')
-    premium_atm = st.number_input('Premium for ATM Options', min_value=0.0, value=10.0, key='premium_atm')
-    strike_price_otm_put = st.number_input('Strike Price for OTM Put', min_value=0, value=strike_price - 10, key='strike_price_otm_put')
-    premium_otm_put = st.number_input('Premium for OTM Put', min_value=0.0, value=10.0, key='premium_otm_put')
-    strike_price_otm_call = st.number_input('Strike Price for OTM Call', min_value=0, value=strike_price + 10, key='strike_price_otm_call')
-    premium_otm_call = st.number_input('Premium for OTM Call', min_value=0.0, value=3.0, key='premium_otm_call')
-    # Inputs specific to Iron Condor
-elif strategy == "Iron Condor":
-    strike_price_put_buy = st.number_input('Strike Price for Buy Put', min_value=0, value=strike_price - 20, key='strike_price_put_buy')
-    premium_put_buy = st.number_input('Premium for Buy Put', min_value=0.0, value=1.0, key='premium_put_buy')
-    
-    strike_price_put_sell = st.number_input('Strike Price for Sell Put', min_value=0, value=strike_price -10, key='strike_price_put_sell')
-    premium_put_sell = st.number_input('Premium for Sell Put', min_value=0.0, value=2.0, key='premium_put_sell')
-    
-    strike_price_call_sell = st.number_input('Strike Price for Sell Call', min_value=0, value=strike_price +10, key='strike_price_call_sell')
-    premium_call_sell = st.number_input('Premium for Sell Call', min_value=0.0, value=2.0, key='premium_call_sell')
-    
-    strike_price_call_buy = st.number_input('Strike Price for Buy Call', min_value=0, value=strike_price +20, key='strike_price_call_buy')
-    premium_call_buy = st.number_input('Premium for Buy Call', min_value=0.0, value=1.0, key='premium_call_buy')
-    # Define a label for the strategy
-strategy_label = f'{strategy} Option Payoff'
-# Calculation and plotting based on strategy
-asset_prices = np.linspace(max(0, strike_price - 100), strike_price + 100, 100)
-fig, ax = plt.subplots()
-
-# Initialize payoffs to an empty array
-payoffs = np.zeros_like(asset_prices)
-
-# Calculate payoffs for each strategy
-if strategy == "Call":
-    payoffs = calculate_call_payoff(asset_prices, strike_price, T, r, sigma, premium)
-    strategy_label = 'Long Call Payoff'
-elif strategy == "Put":
-    payoffs = calculate_put_payoff(asset_prices, strike_price, T, r, sigma, premium)
-    strategy_label = 'Long Put Payoff'
-elif strategy == "Straddle":
-    payoffs = calculate_straddle_payoff(asset_prices, strike_price, T, r, sigma, premium_call, premium_put)
-    strategy_label = 'Straddle Payoff'
-    break_even_up = strike_price + premium
-    break_even_down = strike_price - premium
-elif strategy == "Covered Call":
-    payoffs = calculate_covered_call_payoff_bs(asset_prices,purchase_price,strike_price,T,r,sigma,premium)    
-    strategy_label = 'Covered Call Payoff'
-elif strategy == "Married Put":
-    payoffs = calculate_married_put_payoff_bs(asset_prices, purchase_price, strike_price, T, r, sigma, premium_paid)
-    strategy_label = 'Married Put Payoff'
-elif strategy == "Bull Call Spread":
-    payoffs = calculate_bull_call_spread_payoff_bs(asset_prices, strike_price_long_call, strike_price_short_call, T, r, sigma, premium_long_call, premium_short_call)
-    strategy_label = 'Bull Call Spread Payoff'
-elif strategy == "Bull Put Spread":
-    payoffs = calculate_bull_put_spread_payoff_bs(asset_prices, strike_price_short_put, strike_price_long_put, T, r, sigma, premium_short_put, premium_long_put)
-    strategy_label = 'Bull Put Spread Payoff'
-elif strategy == "Protective Collar": 
-    payoffs = calculate_protective_collar_payoff_bs(asset_prices, purchase_price, strike_price_put, premium_put, strike_price_call, premium_call, T, r, sigma)
-    strategy_label = 'Protective Collar Payoff'
-elif strategy == "Long Call Butterfly Spread":
-    payoffs = calculate_long_call_butterfly_payoff_bs(asset_prices, strike_price_low, strike_price_mid, strike_price_high, T, r, sigma, premium_low, premium_mid, premium_high)
-    strategy_label = 'Long Call Butterfly Spread Payoff'
-elif strategy == "Iron Butterfly":
-    payoffs = calculate_iron_butterfly_payoff_bs(asset_prices, strike_price_atm, strike_price_otm_put, strike_price_otm_call, T, r, sigma, premium_atm, premium_otm_put, premium_otm_call)
-    strategy_label = 'Iron Butterfly Payoff'
-elif strategy == "Iron Condor":
-    # Calculate payoffs for the Iron Condor strategy
-    payoffs = calculate_iron_condor_payoff_bs(asset_prices, strike_price_put_buy, strike_price_put_sell, strike_price_call_buy, strike_price_call_sell, T, r, sigma, premium_put_buy, premium_put_sell, premium_call_buy, premium_call_sell)
-    strategy_label = 'Iron Condor Payoff'    
-
-
-# Common plot settings
-ax.plot(asset_prices, payoffs, label=strategy_label)
-ax.axhline(0, color='grey', lw=1)
-ax.set_xlabel('Stock Price (USD)')
-ax.set_ylabel('Profit / Loss (USD) x 100')
-ax.set_title(f'{strategy} Payoff at Different Prices')
-
-# Shading for profit/loss based on the strategy
-# For strategies like Straddle, Butterfly, Iron Butterfly, Iron Condor, etc., where the profit/loss regions are not straightforward,
-# we need to compute the specific conditions for profit and loss based on the strategy's payoff profile.
-if strategy in ["Call", "Put", "Bull Call Spread", "Bull Put Spread", "Covered Call", "Married Put"]:
-    ax.fill_between(asset_prices, payoffs, where=(np.array(payoffs) > 0), color='green', alpha=0.3)
-    ax.fill_between(asset_prices, payoffs, where=(np.array(payoffs) <= 0), color='red', alpha=0.3)
-elif strategy in ["Covered Call"]:
-    break_even = purchase_price - premium
-    max_profit = premium  # Maximum profit is the premium received
-    ax.axvline(x=break_even, color='blue', linestyle='--')
-    ax.text(break_even, 0, f' Break-Even\n ${break_even}', horizontalalignment='right')
-    ax.axhline(y=max_profit, color='blue', linestyle='--')
-    ax.text(asset_prices[-1], max_profit, f' Max Profit: ${max_profit}', verticalalignment='bottom')
-elif strategy in ["Long Call Butterfly Spread", "Iron Butterfly", "Iron Condor"]:
-    # Typically, these strategies have a profit region around the ATM strikes and losses elsewhere
-    profit_indices = (payoffs > 0)
-    ax.fill_between(asset_prices, payoffs, 0, where=profit_indices, color='green', alpha=0.3)
-    ax.fill_between(asset_prices, payoffs, 0, where=~profit_indices, color='red', alpha=0.3)
-    
-    # For Iron Condor, max profit occurs between the short put and short call strike prices
-elif strategy == "Iron Condor":
-        profit_range = (asset_prices > strike_price_put_sell) & (asset_prices < strike_price_call_sell)
-        ax.fill_between(asset_prices, payoffs, 0, where=profit_range, color='green', alpha=0.3)
-        ax.fill_between(asset_prices, payoffs, 0, where=~profit_range, color='red', alpha=0.3)
-# Apply shading logic for strategies with more complex payoff structures like Butterfly spreads
-elif strategy in ["Long Call Butterfly Spread", "Iron Butterfly"]:
-    # Identify profit and loss indices
-    profit_indices = (asset_prices > strike_price_low) & (asset_prices < strike_price_high)
-    loss_indices = ~profit_indices
-
-    ax.fill_between(asset_prices, payoffs, 0, where=profit_indices, color='green', alpha=0.3)
-    ax.fill_between(asset_prices, payoffs, 0, where=loss_indices, color='red', alpha=0.3)
-
-elif strategy == "Protective Collar":
-    # Calculate payoffs
-    strategy_label = 'Protective Collar Payoff'
-# Calculate maximum profit and maximum loss
-    max_profit = (strike_price_call - purchase_price) - (premium_put - premium_call)
-    max_loss = (purchase_price - strike_price_put) - (premium_put - premium_call)
-    
-    # Create plot
-    fig, ax = plt.subplots()
-    ax.plot(asset_prices, payoffs, label=strategy_label)
-    
-# Shading for profit and loss areas
-    ax.fill_between(asset_prices, payoffs, where=(payoffs >= 0), color='green', alpha=0.3, interpolate=True)
-    ax.fill_between(asset_prices, payoffs, where=(payoffs < 0), color='red', alpha=0.3, interpolate=True)
-    
-# Max profit and loss lines and annotations
-    ax.axhline(y=max_profit, color='blue', linestyle='--', label=f'Max Profit: ${max_profit:.2f}')
-    # The max loss should be plotted as a negative value because it represents a loss
-    ax.axhline(y=-max_loss, color='orange', linestyle='--', label=f'Max Loss: ${-max_loss:.2f}')
-    # Set axis labels and title
-    ax.set_xlabel('Stock Price (USD)')
-    ax.set_ylabel('Profit / Loss (USD)')
-    ax.set_title('Protective Collar Strategy Payoff')
-
-elif strategy == "Straddle":
-    # Calculate break-even points
-
-    total_premium = premium * 2
-    # Calculate break-even points
-    upper_break_even = strike_price + total_premium
-    lower_break_even = strike_price - total_premium
-
-    # Calculate the profit indices (where the strategy is profitable)
-    profit_indices = (asset_prices < lower_break_even) | (asset_prices > upper_break_even)
-    
-    # Fill between for profit areas
-    ax.fill_between(asset_prices, payoffs, 0, where=profit_indices, color='green', alpha=0.3)
-    
-    # Fill between for loss areas
-    ax.fill_between(asset_prices, payoffs, 0, where=~profit_indices, color='red', alpha=0.3)
+# Payoff chart. Payoffs come from the shared LRU payoff cache, so a premium change only
+# re-weights cached leg prices before the chart is redrawn, and a moved strike prices its
+# own leg plus the other legs on just its own segment of the price grid
+@st.fragment
+def payoff_chart_panel(strategy, strategy_obj, strategy_label, asset_prices, grid_segments, T, r, sigma):
+    timer = get_stage_timer()
+    with timer.stage('payoff', strategy=strategy, points=len(asset_prices)):
+        payoffs = engine.memoized_evaluate_strategy(strategy_obj, asset_prices, T, r, sigma, get_payoff_cache(), grid_segments)
+    # Exact break-evens and extremes of the value curve (at expiry when T is 0)
+    with timer.stage('analytics', strategy=strategy):
+        analytics = engine.analyze_strategy(strategy_obj, asset_prices, T, r, sigma, payoffs)
+
+    # Charts are drawn from a library-independent spec on a downsampled curve; matplotlib
+    # renders are cached as PNGs, the Plotly figure is reused across reruns of this session
+    chart_engine = st.radio('Chart Engine', ['Matplotlib', 'Plotly'], horizontal=True)
+    with timer.stage('render', chart=chart_engine):
+        chart_x, chart_y = engine.downsample_minmax(asset_prices, payoffs)
+        chart_spec = engine.payoff_chart_spec(strategy, chart_x, chart_y, strategy_label, analytics)
+        if chart_engine == 'Matplotlib':
+            st.image(get_figure_cache().get_or_create(('payoff', engine.cache_key(chart_spec)), lambda: engine.render_payoff_png(chart_spec)))
+        else:
+            st.session_state['payoff_figure'] = engine.render_payoff_plotly(chart_spec, st.session_state.get('payoff_figure'))
+            st.plotly_chart(st.session_state['payoff_figure'])
+    profit_column, loss_column, break_even_column = st.columns(3)
+    profit_column.metric('Max Profit', 'Unlimited' if np.isinf(analytics['max_profit']) else f"${analytics['max_profit']:,.2f}")
+    loss_column.metric('Max Loss', 'Unlimited' if np.isinf(analytics['max_loss']) else f"${analytics['max_loss']:,.2f}")
+    break_even_column.metric('Break-Even', ', '.join(f'${price:,.2f}' for price in analytics['break_evens']) or 'None')
+
+# P&L surface: strategy value and Greeks over price x days to expiry, in one broadcasted pass
+@st.fragment
+def surface_panel(strategy, strategy_obj, asset_prices, days_to_expiry, r, sigma):
+    if not st.checkbox('Show P&L surface over price and time to expiry'):
+        return
+    if days_to_expiry <= 0:
+        st.info('Pick an expiration date after the current date to see the surface.')
+        return
+    surface_metric = st.selectbox('Surface', ['Value', 'Delta', 'Gamma', 'Vega', 'Theta', 'Rho'])
+    surface_view = st.radio('View', ['Heatmap', '3D Surface'], horizontal=True)
+    price_points = st.slider('Price points', min_value=50, max_value=1000, value=500, step=50)
+    surface_prices = np.linspace(asset_prices[0], asset_prices[-1], price_points)
+    surface_days = np.linspace(0, days_to_expiry, min(days_to_expiry + 1, 365))
+    with get_stage_timer().stage('surface', points=surface_prices.size * surface_days.size):
+        surface = engine.evaluate_strategy_greeks(strategy_obj, surface_prices[:, np.newaxis], surface_days[np.newaxis, :] / 365, r, sigma)
+    # Display units: vega and rho per 1% move, theta per calendar day
+    scale = {'Vega': 0.01, 'Rho': 0.01, 'Theta': 1 / 365}.get(surface_metric, 1.0)
+    z = surface[surface_metric.lower()].T * scale
+    if surface_view == 'Heatmap':
+        fig_surface = go.Figure(go.Heatmap(x=surface_prices, y=surface_days, z=z, colorscale='RdYlGn', zmid=0 if surface_metric == 'Value' else None))
+    else:
+        fig_surface = go.Figure(go.Surface(x=surface_prices, y=surface_days, z=z, colorscale='RdYlGn'))
+        fig_surface.update_layout(scene=dict(xaxis_title='Stock Price (USD)', yaxis_title='Days to Expiry', zaxis_title=surface_metric))
+    fig_surface.update_layout(title=f'{strategy} {surface_metric} by Price and Days to Expiry',
+                              xaxis_title='Stock Price (USD)', yaxis_title='Days to Expiry')
+    st.plotly_chart(fig_surface)
+
+# Monte Carlo P&L distribution of the selected strategy at expiry
+@st.fragment
+def monte_carlo_panel(strategy, strategy_obj, asset_price, T, r, sigma):
+    with st.expander('Monte Carlo P&L distribution'):
+        if T <= 0:
+            st.info('Pick an expiration date after the current date to simulate the strategy.')
+            return
+        mc_columns = st.columns(3)
+        mc_paths = mc_columns[0].number_input('Paths', min_value=10_000, max_value=50_000_000, value=1_000_000, step=100_000)
+        mc_chunk_size = mc_columns[1].number_input('Chunk size', min_value=1_000, max_value=1_000_000, value=100_000, step=10_000)
+        mc_seed = mc_columns[2].number_input('Seed', min_value=0, value=42, step=1)
+        mc_drift = mc_columns[0].number_input('Expected annual return (drift)', value=r, step=0.01, format='%.4f')
+        mc_workers = mc_columns[1].number_input('Worker processes', min_value=1, max_value=os.cpu_count() or 1, value=1)
+        mc_level = mc_columns[2].selectbox('VaR / CVaR level', [0.95, 0.99, 0.90])
+        mc_antithetic = st.checkbox('Antithetic variates')
+        mc_control_variate = st.checkbox('Control variate (simulated price)')
+        if st.button('Run simulation'):
+            with get_stage_timer().stage('monte_carlo', paths=int(mc_paths)):
+                mc = engine.monte_carlo_strategy(strategy_obj, asset_price, T, r, sigma, n_paths=int(mc_paths), chunk_size=int(mc_chunk_size),
+                                                 seed=int(mc_seed), mu=mc_drift, antithetic=mc_antithetic,
+                                                 control_variate=mc_control_variate, n_workers=int(mc_workers), level=mc_level)
+            metric_columns = st.columns(4)
+            metric_columns[0].metric('Expected P&L', f"${mc['expected_pnl']:.2f}", f"± {mc['std_error']:.4f} s.e.", delta_color='off')
+            metric_columns[1].metric('Probability of Profit', f"{mc['probability_of_profit']:.1%}")
+            metric_columns[2].metric(f"VaR {mc_level:.0%}", f"${mc['var']:.2f}")
+            metric_columns[3].metric(f"CVaR {mc_level:.0%}", f"${mc['cvar']:.2f}")
+            # Fold the overflow bins into the edge bins for display
+            counts = mc['counts'][1:-1].copy()
+            counts[0] += mc['counts'][0]
+            counts[-1] += mc['counts'][-1]
+            centers = (mc['edges'][:-1] + mc['edges'][1:]) / 2
+            fig_mc = go.Figure(go.Bar(x=centers, y=counts / mc['paths'], marker_color=np.where(centers > 0, 'green', 'red')))
+            fig_mc.update_layout(title=f"{strategy} P&L at Expiry ({mc['paths']:,} paths)", xaxis_title='Profit / Loss (USD)',
+                                 yaxis_title='Probability', bargap=0)
+            st.plotly_chart(fig_mc)
+
+@st.fragment
+def backtest_panel(strategy, selected_symbol, r, sigma):
+    with st.expander('Historical backtest'):
+        if strategy not in engine.STRATEGY_TEMPLATES:
+            st.info('Backtests use strikes relative to spot, so they are available for the built-in strategies only.')
+            return
+        bt_columns = st.columns(3)
+        bt_years = bt_columns[0].selectbox('History', [1, 2, 5, 10], index=1, format_func=lambda years: f'{years}y')
+        bt_holding_days = bt_columns[1].number_input('Holding period (trading days)', min_value=1, max_value=252, value=30)
+        bt_width = bt_columns[2].number_input('Strike spacing (% of spot)', min_value=0.5, max_value=50.0, value=5.0, step=0.5) / 100
+        bt_vol_source = bt_columns[0].radio('Volatility', ['20-day historical', 'Flat sigma'], horizontal=True)
+        bt_sweep = st.checkbox('Sweep all symbols and strategies')
+        if st.button('Run backtest'):
+            vol_sigma = sigma if bt_vol_source == 'Flat sigma' else None
+            if bt_sweep:
+                frames = {symbol: get_backtest_history(symbol, bt_years) for symbol in engine.SYMBOLS}
+                with get_stage_timer().stage('backtest', symbol='all'):
+                    sweep = engine.backtest_sweep(frames, holding_days=int(bt_holding_days), width=bt_width, r=r, sigma=vol_sigma)
+                st.dataframe(sweep, hide_index=True)
+                return
+            history = get_backtest_history(selected_symbol, bt_years)
+            if history.empty:
+                st.warning(f'No price history for {selected_symbol}.')
+                return
+            closes = history['Close'].to_numpy(dtype=float)
+            if vol_sigma is None:
+                bars = [history[field].to_numpy(dtype=float)[:, np.newaxis] for field in ('Open', 'High', 'Low', 'Close')]
+                vol_sigma = engine.rolling_volatility(*bars, window=20, estimator='Close-to-Close')[:, 0]
+            with get_stage_timer().stage('backtest', symbol=selected_symbol):
+                entries, marks = engine.backtest_strategies([strategy], closes, int(bt_holding_days), bt_width, r, vol_sigma)
+            if entries.size == 0:
+                st.warning('Not enough history for this holding period.')
+                return
+            final_pnl = marks[0, :, -1]
+            summary = engine.backtest_summary(final_pnl)
+            metric_columns = st.columns(4)
+            metric_columns[0].metric('Trades', f"{summary['Trades']:,}")
+            metric_columns[1].metric('Mean P&L', f"${summary['Mean P&L']:.2f}")
+            metric_columns[2].metric('Win Rate', f"{summary['Win Rate']:.1%}")
+            metric_columns[3].metric('5% / 95%', f"${summary['5%']:.2f} / ${summary['95%']:.2f}")
+            fig_bt = go.Figure(go.Histogram(x=final_pnl, nbinsx=50))
+            fig_bt.update_layout(title=f'{strategy} P&L at Expiry over {entries.size} Entries', xaxis_title='Profit / Loss (USD)',
+                                 yaxis_title='Trades', bargap=0)
+            st.plotly_chart(fig_bt)
+            fig_path = go.Figure(go.Scatter(x=np.arange(marks.shape[2]), y=marks[0].mean(axis=0), name='Mean P&L'))
+            fig_path.add_trace(go.Scatter(x=np.arange(marks.shape[2]), y=np.percentile(marks[0], 5, axis=0), name='5th percentile'))
+            fig_path.add_trace(go.Scatter(x=np.arange(marks.shape[2]), y=np.percentile(marks[0], 95, axis=0), name='95th percentile'))
+            fig_path.update_layout(title='Mark-to-Market P&L by Holding Day', xaxis_title='Days Held', yaxis_title='Profit / Loss (USD)')
+            st.plotly_chart(fig_path)
+            st.dataframe(pd.DataFrame({'Entry Date': history['Date'].to_numpy()[entries], 'Entry Price': closes[entries],
+                                       'P&L': final_pnl}), hide_index=True)
+
+# Strike scanner: ranks every strike combination of the selected spread, butterfly or condor
+# on a ladder around spot, and can copy the chosen strikes and premiums into the inputs
+@st.fragment
+def scanner_panel(strategy, asset_price, T, r, sigma):
+    with st.expander('Strike scanner'):
+        if strategy not in engine.SCAN_STRUCTURES:
+            st.info('The scanner covers the spreads, butterflies and condors.')
+            return
+        if T <= 0:
+            st.info('Pick an expiration date after the current date to scan strikes.')
+            return
+        scan_columns = st.columns(3)
+        scan_step = scan_columns[0].number_input('Strike step', min_value=1, value=max(1, int(round(asset_price * 0.025))), step=1)
+        scan_width = scan_columns[1].number_input('Strikes each side of spot', min_value=2, max_value=60, value=10, step=1)
+        scan_drift = scan_columns[2].number_input('Expected annual return (drift)', value=r, step=0.01, format='%.4f', key='scan_drift')
+        scan_score = scan_columns[0].selectbox('Rank by', list(engine.SCAN_SCORES))
+        scan_min_probability = scan_columns[1].slider('Minimum probability of profit', 0.0, 1.0, 0.0, 0.05)
+        scan_top_k = scan_columns[2].number_input('Candidates to show', min_value=1, max_value=100, value=20, step=1)
+        ladder = int(round(asset_price)) + scan_step * np.arange(-scan_width, scan_width + 1)
+        ladder = ladder[ladder > 0]
+        scan_size = engine.scan_size(strategy, len(ladder))
+        st.caption(f'{len(ladder)} strikes from {ladder[0]} to {ladder[-1]} ({scan_size:,} combinations), priced at sigma = {sigma:.0%}')
+        too_many = scan_size > engine.MAX_SCAN_COMBINATIONS
+        if too_many:
+            st.warning(f'Scans are limited to {engine.MAX_SCAN_COMBINATIONS:,} combinations; use fewer strikes each side of spot.')
+        if st.button('Scan strikes', disabled=too_many):
+            with get_stage_timer().stage('scan', strategy=strategy, strikes=len(ladder)):
+                scan = engine.scan_strikes(strategy, ladder, asset_price, T, r, sigma, mu=scan_drift,
+                                           score=engine.SCAN_SCORES[scan_score], top_k=int(scan_top_k),
+                                           min_probability=scan_min_probability)
+            st.session_state['scan_result'] = (strategy, scan)
+
+        scan_result = st.session_state.get('scan_result')
+        if scan_result is None or scan_result[0] != strategy:
+            return
+        scan = scan_result[1]
+        st.write(f"{scan['scanned']:,} combinations scanned, {scan['feasible']:,} feasible")
+        if not scan['candidates']:
+            st.warning('No strike combination meets the filters.')
+            return
+        candidates = pd.DataFrame([{'Strikes': ' / '.join(f'{strike:g}' for strike in candidate['strikes']),
+                                    'Net Premium': candidate['net_premium'], 'Expected P&L': candidate['expected_pnl'],
+                                    'Probability of Profit': candidate['probability_of_profit'],
+                                    'Max Profit': candidate['max_profit'], 'Max Loss': candidate['max_loss'],
+                                    'Reward / Risk': candidate['reward_risk']} for candidate in scan['candidates']])
+        st.dataframe(candidates.style.format({'Probability of Profit': '{:.1%}', 'Reward / Risk': '{:.2f}'}, precision=2),
+                     hide_index=True)
+        choice = st.selectbox('Candidate', range(len(candidates)), format_func=lambda i: candidates['Strikes'][i])
+        if st.button('Use these strikes'):
+            st.session_state['scanned_params'] = (strategy, scan['candidates'][choice]['params'])
+            st.rerun(scope='app')
+
+# Strategy inputs; the chart and analysis panels are nested fragments of this one
+@st.fragment
+def strategy_panel(selected_symbol, most_recent_close):
+    # Strategy selection
+    strategy = st.selectbox("Select Strategy", list(engine.STRATEGIES) + ["Custom"])
+    # Strategy parameters
+    asset_price = st.number_input('Underlying Asset Price', value=most_recent_close, key=f'asset_price_{selected_symbol}')
+    strike_price = st.number_input('Strike Price', value=int(round(asset_price, 0)), step=1, key=f'strike_{strategy}')
+    premium = st.number_input('Premium',value=10.0, step = 0.01, key=f'premium_{strategy}')
+    current_date = st.date_input('Current Date', key=f'current_{strategy}')
+    expiration_date = st.date_input('Expiration Date', key=f'expiry_{strategy}')
+
+    T = (expiration_date - current_date).days / 365  # Time to expiration in years
+    r = 0.05  # Risk-free interest rate
+
+    # Data-driven default for sigma: rolling historical volatility of the selected symbol
+    volatility_estimator = st.selectbox('Historical Volatility Estimator', list(engine.VOLATILITY_ESTIMATORS),
+                                        index=list(engine.VOLATILITY_ESTIMATORS).index('Yang-Zhang'))
+    volatility_window = st.number_input('Volatility Window (trading days)', min_value=5, max_value=250, value=20, step=1)
+    timer = get_stage_timer()
+    with timer.stage('volatility', window=int(volatility_window)):
+        hv_table = get_historical_volatility_table(int(volatility_window), selected_symbol)
+    default_sigma = hv_table[volatility_estimator].get(selected_symbol, np.nan)
+    if not np.isfinite(default_sigma):
+        default_sigma = 0.25
+    sigma = st.number_input('Volatility (sigma)', min_value=0.01, value=round(float(default_sigma), 4), step=0.01, format='%.4f',
+                            key=f'sigma_{selected_symbol}_{volatility_estimator}_{volatility_window}')
+    with st.expander('Historical volatility across symbols'):
+        st.dataframe(hv_table.style.format('{:.1%}', na_rep='loading'))
+
+    params = {'strike_price': strike_price, 'premium': premium}
+    if strategy == "Custom":
+        # Custom strategies are entered as a table of legs plus an optional stock position
+        legs_table = st.data_editor(
+            pd.DataFrame([{'option_type': 'call', 'strike': float(strike_price), 'quantity': 1.0, 'premium': premium, 'position': 'long'}]),
+            num_rows='dynamic', key='custom_legs',
+            column_config={'option_type': st.column_config.SelectboxColumn('Type', options=['call', 'put'], required=True),
+                           'position': st.column_config.SelectboxColumn('Position', options=['long', 'short'], required=True)})
+        stock_quantity = st.number_input('Shares of Underlying Held', value=0.0, step=1.0, key='custom_stock_quantity')
+        stock_price = st.number_input('Purchase Price of Underlying Asset', value=asset_price, key='custom_stock_price')
+        strategy_obj = engine.custom_strategy(legs_table.to_dict('records'), stock_quantity, stock_price)
+        strategy_label = 'Custom Strategy Payoff'
+    else:
+        strategy_label, _, strategy_inputs = engine.STRATEGIES[strategy]
+        # Strikes picked in the scanner are applied before the inputs are created
+        scanned = st.session_state.pop('scanned_params', None)
+        if scanned is not None and scanned[0] == strategy:
+            for name, value in scanned[1].items():
+                st.session_state[f'{name}_{strategy}'] = int(value) if name.startswith('strike_price') and value.is_integer() else value
+        for name, label, default, min_value in strategy_inputs:
+            params[name] = st.number_input(label, min_value=min_value, value=default(strike_price, asset_price), key=f'{name}_{strategy}')
+        strike_price = params['strike_price']
+        strategy_obj = engine.build_strategy(strategy, params)
+
+    # Per-leg implied volatility from the entered premiums instead of the flat sigma
+    if st.checkbox('Use implied volatility from each leg premium') and T > 0:
+        with timer.stage('pricing', strategy=strategy, implied_volatility=True):
+            strategy_obj, iv_report = engine.strategy_implied_volatilities(strategy_obj, asset_price, T, r)
+        if not iv_report.empty:
+            st.dataframe(iv_report, hide_index=True)
+            if not iv_report['Converged'].all():
+                failed_legs = ', '.join(iv_report.loc[~iv_report['Converged'], 'Leg'])
+                st.warning(f"No implied volatility matches the premium for: {failed_legs}. Those legs use sigma = {sigma:.0%}.")
+
+    # Listed options on these symbols are American: the chosen legs are priced on a
+    # binomial or trinomial lattice, with quarterly cash dividends if the stock pays them
+    exercise_style = st.radio('Exercise Style', ['European', 'American'], horizontal=True)
+    if exercise_style == 'American' and strategy_obj.legs:
+        lattice_method = st.radio('Lattice', ['Binomial', 'Trinomial'], horizontal=True)
+        lattice_steps = st.slider('Lattice steps', min_value=50, max_value=2000, value=500, step=50)
+        dividend = st.number_input('Quarterly dividend per share', min_value=0.0, value=0.0, step=0.01)
+        days_to_dividend = st.number_input('Days to next ex-dividend date', min_value=0, value=30, step=1)
+        leg_labels = [f'{leg.position} {leg.option_type} {leg.strike:g}' for leg in strategy_obj.legs]
+        american_legs = st.multiselect('Legs with American exercise', range(len(leg_labels)), default=list(range(len(leg_labels))),
+                                       format_func=lambda i: leg_labels[i])
+        lattice = engine.Lattice(lattice_method.lower(), lattice_steps, dividends=engine.dividend_schedule(dividend, days_to_dividend / 365, T))
+        strategy_obj = engine.with_lattice(strategy_obj, lattice, american_legs)
+
+    # Calculation and plotting based on strategy, on a price grid scaled to the strikes and
+    # spot and concentrated around the strikes
+    grid_segments = engine.adaptive_grid_segments(strategy_obj, asset_price, T, sigma)
+    asset_prices = np.unique(np.concatenate(grid_segments))
+    payoff_chart_panel(strategy, strategy_obj, strategy_label, asset_prices, grid_segments, T, r, sigma)
+    surface_panel(strategy, strategy_obj, asset_prices, (expiration_date - current_date).days, r, sigma)
+    monte_carlo_panel(strategy, strategy_obj, asset_price, T, r, sigma)
+    backtest_panel(strategy, selected_symbol, r, sigma)
+    scanner_panel(strategy, asset_price, T, r, sigma)
+
+# Opt-in timing panel: wall time per stage of the last run, exportable as JSON lines
+def timing_panel(timer):
+    with st.sidebar.expander('Timings', expanded=True):
+        last_run = timer.last_run()
+        if last_run.empty:
+            st.write('No timings recorded yet.')
+        else:
+            totals = last_run.groupby('stage', sort=False)['seconds'].sum()
+            st.dataframe(pd.DataFrame({'Stage': totals.index, 'ms': totals.to_numpy() * 1000}).style.format({'ms': '{:.1f}'}),
+                         hide_index=True)
+            st.caption(f"Run {timer.run}: {totals.sum() * 1000:.1f} ms in total. Charts redrawn by a fragment update their rows on the next full rerun.")
+        st.download_button('Export timings (JSON lines)', timer.to_json_lines(), file_name='timings.jsonl', mime='application/x-ndjson')
+
+def main():
+    # Timing is opt-in; it has to be switched on before any stage runs
+    timer = get_stage_timer()
+    timer.enabled = st.sidebar.checkbox('Show timings')
+    timer.start_run()
+
+    st.title('Options Strategy Visualizer')
+
+    # The whole symbol universe is warmed up in the background; show how that is going
+    with st.sidebar.expander('Market data warm-up'):
+        warmer = get_market_data_warmer()
+        last_run, warm_up_stats = warmer.report()
+        st.caption(f'{warmer.max_workers} workers, {warmer.retries} retries, refresh every {warmer.refresh_seconds:.0f}s')
+        if last_run is None:
+            st.write('Warm-up in progress...')
+        else:
+            st.write(f"Last pass finished at {last_run['finished']:%H:%M:%S} in {last_run['seconds']:.2f}s")
+        st.dataframe(warm_up_stats, hide_index=True)
 
-    # Break-even lines
-    ax.axvline(x=upper_break_even, color='blue', linestyle='--', label=f'Break-Even Up ${upper_break_even:.2f}')
-    ax.axvline(x=lower_break_even, color='purple', linestyle='--', label=f'Break-Even Down ${lower_break_even:.2f}')
-    
-    # Text for break-even points
-    ax.text(upper_break_even, 0, f' ${upper_break_even:.2f}', horizontalalignment='right', verticalalignment='bottom')
-    ax.text(lower_break_even, 0, f' ${lower_break_even:.2f}', horizontalalignment='left', verticalalignment='bottom')
+    # API data fetch
+    selected_symbol = st.selectbox("Select Stock Symbol", engine.SYMBOLS)
+
+    # Display a placeholder for the most recent close price
+    most_recent_close = 0.00
+
+    if selected_symbol:
+        market_data_panel(selected_symbol)
+        most_recent_close = get_underlying_asset_price(selected_symbol) or most_recent_close
 
-# Add legend and layout adjustments
-ax.legend()
-plt.tight_layout()
+    strategy_panel(selected_symbol, most_recent_close)
+    if timer.enabled:
+        timing_panel(timer)
 
-st.pyplot(fig)
+# Streamlit runs the script as __main__; importing it (e.g. from benchmarks.py) only
+# defines the functions
+if __name__ == '__main__':
+    main()
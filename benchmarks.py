@@ -0,0 +1,210 @@
+# Benchmarks for the pricing, payoff, market data and chart functions of options_engine.
+# Every strategy function, plus an iron condor priced on an American lattice, runs at grid
+# sizes from 100 to 1M points; each case records its median wall time, throughput and
+# peak traced memory, and the run is compared against a stored baseline so regressions
+# show up as numbers instead of "it feels slow".
+#
+#   python benchmarks.py                      run everything and compare with the baseline
+#   python benchmarks.py --filter iron_condor only the cases whose name contains the text
+#   python benchmarks.py --save-baseline      store this run as the new baseline
+#   python benchmarks.py --output run.json    also write this run's results
+#
+# The exit status is 1 when any case (chart renders excepted) is slower (or uses more
+# memory) than the baseline by more than --tolerance, and by at least --min-time-delta
+# seconds (--min-memory-delta bytes), so tiny cases don't flag on noise. Baselines are
+# machine specific: regenerate the file when moving to different hardware.
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+import options_engine as engine
+
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+BASELINE_PATH = os.path.join(APP_DIR, 'benchmark_baseline.json')
+SIZES = [100, 1_000, 10_000, 100_000, 1_000_000]
+T, R, SIGMA = 0.5, 0.05, 0.25
+
+# Arguments of every strategy function after asset_prices, around a strike of 100
+STRATEGY_CASES = {
+    'calculate_call_payoff': (engine.calculate_call_payoff, (100, T, R, SIGMA, 10.0)),
+    'calculate_put_payoff': (engine.calculate_put_payoff, (100, T, R, SIGMA, 10.0)),
+    'calculate_straddle_payoff': (engine.calculate_straddle_payoff, (100, T, R, SIGMA, 5.0, 5.0)),
+    'calculate_covered_call_payoff_bs': (engine.calculate_covered_call_payoff_bs, (100, 110, T, R, SIGMA, 5.0)),
+    'calculate_married_put_payoff_bs': (engine.calculate_married_put_payoff_bs, (100, 95, T, R, SIGMA, 10.0)),
+    'calculate_bull_call_spread_payoff_bs': (engine.calculate_bull_call_spread_payoff_bs, (100, 110, T, R, SIGMA, 10.0, 5.0)),
+    'calculate_bull_put_spread_payoff_bs': (engine.calculate_bull_put_spread_payoff_bs, (100, 90, T, R, SIGMA, 10.0, 5.0)),
+    'calculate_protective_collar_payoff_bs': (engine.calculate_protective_collar_payoff_bs, (100, 95, 5.0, 110, 5.0, T, R, SIGMA)),
+    'calculate_long_call_butterfly_payoff_bs': (engine.calculate_long_call_butterfly_payoff_bs, (90, 100, 110, T, R, SIGMA, 3.0, 4.0, 8.0)),
+    'calculate_iron_butterfly_payoff_bs': (engine.calculate_iron_butterfly_payoff_bs, (100, 90, 110, T, R, SIGMA, 10.0, 10.0, 3.0)),
+    'calculate_iron_condor_payoff_bs': (engine.calculate_iron_condor_payoff_bs, (80, 90, 120, 110, T, R, SIGMA, 1.0, 2.0, 1.0, 2.0)),
+}
+
+# An iron condor with every leg American, on a 1000-step binomial lattice
+LATTICE_STRATEGY = engine.with_lattice(engine.iron_condor_strategy(80, 90, 120, 110, 1.0, 2.0, 1.0, 2.0), engine.Lattice('binomial', 1000))
+
+# Chart renders are timed and reported but left out of the regression check: their time is
+# almost all matplotlib/Plotly and varies by 30-50% between runs of an unchanged tree
+UNGATED_CASES = {'render_payoff_png', 'render_payoff_plotly'}
+
+def asset_grid(size):
+    return np.linspace(0, 200, size)
+
+# Benchmark cases as (name, size, setup, measure options) where setup(directory) returns
+# the callable to time; anything built in setup (grids, stores) is excluded from the
+# measurement, and `directory` is a scratch directory removed once the case is measured
+def benchmark_cases(sizes):
+    cases = []
+    for size in sizes:
+        cases.append(('black_scholes_call', size, lambda directory, size=size: lambda prices=asset_grid(size): engine.black_scholes_call(prices, 100, T, R, SIGMA), {}))
+        for name, (function, args) in STRATEGY_CASES.items():
+            cases.append((name, size, lambda directory, size=size, function=function, args=args: lambda prices=asset_grid(size): function(prices, *args), {}))
+        cases.append(('lattice_iron_condor', size, lambda directory, size=size: lambda prices=asset_grid(size): engine.evaluate_strategy(LATTICE_STRATEGY, prices, T, R, SIGMA), {}))
+        cases.append(('render_payoff_png', size, lambda directory, size=size: render_case(size, engine.render_payoff_png), {}))
+        cases.append(('render_payoff_plotly', size, lambda directory, size=size: render_case(size, engine.render_payoff_plotly), {}))
+    cases.append(('fetch_cold', len(engine.SYMBOLS), lambda directory: fetch_case(directory, warm=False), {}))
+    cases.append(('fetch_warm', len(engine.SYMBOLS), lambda directory: fetch_case(directory, warm=True), {}))
+    return cases
+
+# Downsampling plus drawing of an iron condor payoff evaluated on `size` points
+def render_case(size, render):
+    prices = asset_grid(size)
+    payoffs = engine.calculate_iron_condor_payoff_bs(prices, *STRATEGY_CASES['calculate_iron_condor_payoff_bs'][1])
+    def run():
+        x, y = engine.downsample_minmax(prices, payoffs)
+        return render(engine.payoff_chart_spec('Iron Condor', x, y, 'Iron Condor Payoff'))
+    return run
+
+# Loads six months of bars for every symbol from the offline fixtures. A cold fetch
+# starts from an empty SQLite store each time; a warm one is served from the store.
+def fetch_case(directory, warm):
+    provider = engine.OfflineProvider(os.path.join(APP_DIR, 'fixtures', 'market_data'))
+    start = pd.Timestamp.today().normalize() - pd.DateOffset(months=6)
+    warm_store = engine.MarketDataStore(os.path.join(directory, 'warm.sqlite'), provider)
+    def run():
+        store = warm_store if warm else engine.MarketDataStore(os.path.join(directory, f'cold-{time.perf_counter_ns()}.sqlite'), provider)
+        return [store.get_history(symbol, start) for symbol in engine.SYMBOLS]
+    if warm:
+        run()
+    return run
+
+# Median of repeated runs (at least `min_repeats`, until `min_seconds` have been spent)
+# followed by one traced run for the peak memory
+def measure(run, min_repeats=3, max_repeats=50, min_seconds=0.2):
+    run()
+    times = []
+    while len(times) < min_repeats or (len(times) < max_repeats and sum(times) < min_seconds):
+        started = time.perf_counter()
+        run()
+        times.append(time.perf_counter() - started)
+    tracemalloc.start()
+    try:
+        run()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {'median_seconds': float(np.median(times)), 'min_seconds': float(np.min(times)), 'repeats': len(times),
+            'peak_memory_bytes': int(peak)}
+
+# One pass over the (filtered) cases: {(name, size): measure result}
+def run_round(sizes, name_filter=None):
+    measured = {}
+    for name, size, setup, options in benchmark_cases(sizes):
+        if name_filter and name_filter not in name:
+            continue
+        with tempfile.TemporaryDirectory(prefix='benchmarks-') as directory:
+            measured[(name, size)] = measure(setup(directory), **options)
+    return measured
+
+# Runs the suite `rounds` times, each in a fresh process: how fast a case runs can differ
+# by 50% from one process to the next (memory layout), and bursts of load on the machine
+# come and go, so one process alone can make an unchanged tree look slower or faster.
+# Each case reports the medians over the rounds of its median and of its fastest run, and
+# the fastest run of its slowest round as a measure of how much it varies between rounds.
+def run_benchmarks(sizes, name_filter=None, rounds=3):
+    measured = {}
+    for _ in range(rounds):
+        with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context('spawn')) as pool:
+            for key, result in pool.submit(run_round, sizes, name_filter).result().items():
+                measured.setdefault(key, []).append(result)
+    results = {}
+    for (name, size), runs in measured.items():
+        result = {'median_seconds': float(np.median([run['median_seconds'] for run in runs])),
+                  'min_seconds': float(np.median([run['min_seconds'] for run in runs])),
+                  'slowest_min_seconds': max(run['min_seconds'] for run in runs),
+                  'repeats': sum(run['repeats'] for run in runs),
+                  'peak_memory_bytes': min(run['peak_memory_bytes'] for run in runs)}
+        result['throughput'] = size / result['median_seconds']
+        results[f'{name}[{size}]'] = {'name': name, 'size': size, **result}
+        print(f"{name:42s} {size:>9,d}  {result['median_seconds'] * 1000:10.3f} ms  {result['throughput']:14,.0f} /s"
+              f"  {result['peak_memory_bytes'] / 2**20:9.2f} MiB", flush=True)
+    return {'meta': {'created': datetime.now().isoformat(timespec='seconds'), 'python': platform.python_version(),
+                     'numpy': np.__version__, 'machine': platform.machine(), 'processor': platform.processor(),
+                     'cpu_count': os.cpu_count()},
+            'results': results}
+
+# Cases slower or hungrier than the baseline by more than `tolerance`. Times are compared
+# on the fastest runs, which scheduler noise can only push up, and a case only counts as
+# slower when it is `tolerance` slower than even the slowest baseline round and lost at
+# least `min_time_delta` seconds, so neither the spread between rounds nor the jitter of
+# cases of a few tens of microseconds flags an unchanged tree (likewise memory must grow
+# by `min_memory_delta`). The reported ratio is against the baseline median.
+def compare(results, baseline, tolerance=0.25, min_time_delta=50e-6, min_memory_delta=64 * 1024):
+    regressions = []
+    for key, result in results['results'].items():
+        reference = baseline['results'].get(key)
+        if reference is None or result['name'] in UNGATED_CASES:
+            continue
+        time_ratio = result['min_seconds'] / reference['min_seconds']
+        slowest = reference.get('slowest_min_seconds', reference['min_seconds'])
+        slower = result['min_seconds'] > (1 + tolerance) * slowest and result['min_seconds'] - reference['min_seconds'] > min_time_delta
+        memory_ratio = (result['peak_memory_bytes'] + 1) / (reference['peak_memory_bytes'] + 1)
+        hungrier = memory_ratio > 1 + tolerance and result['peak_memory_bytes'] - reference['peak_memory_bytes'] > min_memory_delta
+        if slower or hungrier:
+            regressions.append({'case': key, 'time_ratio': time_ratio, 'memory_ratio': memory_ratio})
+    return regressions
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark the pricing, payoff, market data and chart functions of options_engine')
+    parser.add_argument('--sizes', type=int, nargs='+', default=SIZES)
+    parser.add_argument('--rounds', type=int, default=3)
+    parser.add_argument('--filter', dest='name_filter')
+    parser.add_argument('--baseline', default=BASELINE_PATH)
+    parser.add_argument('--save-baseline', action='store_true')
+    parser.add_argument('--output')
+    parser.add_argument('--tolerance', type=float, default=0.25)
+    parser.add_argument('--min-time-delta', type=float, default=50e-6)
+    parser.add_argument('--min-memory-delta', type=int, default=64 * 1024)
+    args = parser.parse_args(argv)
+
+    results = run_benchmarks(args.sizes, args.name_filter, args.rounds)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=1)
+    if args.save_baseline:
+        with open(args.baseline, 'w') as f:
+            json.dump(results, f, indent=1)
+        print(f'Saved baseline to {args.baseline}')
+        return 0
+    if not os.path.exists(args.baseline):
+        print(f'No baseline at {args.baseline}; run with --save-baseline to create one')
+        return 0
+    with open(args.baseline) as f:
+        regressions = compare(results, json.load(f), args.tolerance, args.min_time_delta, args.min_memory_delta)
+    for regression in regressions:
+        print(f"REGRESSION {regression['case']}: {regression['time_ratio']:.2f}x time, {regression['memory_ratio']:.2f}x memory")
+    print(f'{len(regressions)} regression(s) against {args.baseline}')
+    return 1 if regressions else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,49 @@
+# Headless pricing and strategy engine behind the Streamlit app; nothing in this package
+# imports Streamlit. Names are exported lazily: a submodule (and its numpy/scipy/plotly
+# imports) is only loaded when one of its names is first used, e.g.
+#
+#   import options_engine as engine
+#   strategy = engine.build_strategy('Straddle', {'strike_price': 100, 'premium_call': 5, 'premium_put': 5})
+#   payoffs = engine.evaluate_strategy(strategy, prices, T=0.25, r=0.05, sigma=0.2)
+import importlib
+
+_EXPORTS = {
+    'market_data': ['BAR_COLUMNS', 'SYMBOLS', 'MarketDataProvider', 'YahooFinanceProvider', 'OfflineProvider',
+                    'MarketDataStore', 'MarketDataWarmer'],
+    'volatility': ['VOLATILITY_ESTIMATORS', 'rolling_sum', 'rolling_mean', 'rolling_variance', 'close_to_close_variance',
+                   'parkinson_variance', 'garman_klass_variance', 'rogers_satchell_variance', 'yang_zhang_variance',
+                   'rolling_volatility', 'stack_ohlc', 'historical_volatility_table'],
+    'pricing': ['black_scholes_terms', 'black_scholes_batch', 'black_scholes_greeks', 'price_legs', 'black_scholes_call',
+                'black_scholes_put', 'implied_volatility'],
+    'strategies': ['STRATEGIES', 'Leg', 'Strategy', 'strategy_implied_volatilities', 'strategy_weights', 'evaluate_strategies',
+                   'evaluate_strategy', 'evaluate_strategy_greeks', 'call_strategy', 'put_strategy', 'straddle_strategy',
+                   'covered_call_strategy', 'married_put_strategy', 'bull_call_spread_strategy', 'bull_put_spread_strategy',
+                   'protective_collar_strategy', 'long_call_butterfly_strategy', 'iron_butterfly_strategy',
+                   'iron_condor_strategy', 'calculate_call_payoff', 'calculate_put_payoff', 'calculate_straddle_payoff',
+                   'calculate_covered_call_payoff_bs', 'calculate_married_put_payoff_bs',
+                   'calculate_bull_call_spread_payoff_bs', 'calculate_bull_put_spread_payoff_bs',
+                   'calculate_protective_collar_payoff_bs', 'calculate_long_call_butterfly_payoff_bs',
+                   'calculate_iron_butterfly_payoff_bs', 'calculate_iron_condor_payoff_bs', 'build_strategy',
+                   'with_lattice', 'custom_strategy'],
+    'lattice': ['Lattice', 'dividend_schedule', 'lattice_price', 'lattice_greeks'],
+    'montecarlo': ['simulate_gbm_terminal', 'simulate_gbm_paths', 'PnLAccumulator', 'monte_carlo_strategy'],
+    'backtest': ['STRATEGY_TEMPLATES', 'backtest_strategies', 'backtest_summary', 'backtest_sweep'],
+    'analytics': ['adaptive_grid_segments', 'adaptive_price_grid', 'break_evens', 'payoff_extremes', 'analyze_strategy'],
+    'scanner': ['SCAN_STRUCTURES', 'SCAN_SCORES', 'MAX_SCAN_COMBINATIONS', 'scan_size', 'scan_strikes'],
+    'charts': ['downsample_minmax', 'payoff_chart_spec', 'render_payoff_png', 'render_payoff_plotly', 'candlestick_figure'],
+    'caching': ['LRUCache', 'cache_key', 'normalize_strategy', 'memoized_evaluate_strategy'],
+    'timing': ['StageTimer'],
+    'batch': ['strategy_from_config', 'strategy_inputs', 'evaluate_configs', 'evaluate_stream', 'read_configs'],
+}
+_MODULES = {name: module for module, names in _EXPORTS.items() for name in names}
+__all__ = sorted(_MODULES)
+
+def __getattr__(name):
+    if name not in _MODULES:
+        raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
+    value = getattr(importlib.import_module(f'.{_MODULES[name]}', __name__), name)
+    globals()[name] = value
+    return value
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
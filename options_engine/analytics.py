@@ -0,0 +1,186 @@
+# Strategy analytics: adaptive price grids, exact break-evens and max profit / max loss of
+# the strategy value function (the payoff at expiry, the model value of its legs before it)
+import numpy as np
+
+from .lattice import escrowed_dividends
+from .strategies import evaluate_strategy, strategy_weights
+
+# Points added below and above the grid when looking for break-evens, as multiples of its
+# first and last price, so roots outside the plotted range are still found
+LOWER_TAIL = np.array([1e-3])
+UPPER_TAIL = np.array([2.0, 4.0, 16.0, 256.0])
+
+# Price grid for plotting and root bracketing. The range is log-scaled around the strikes,
+# the spot and the stock purchase price: `span` standard deviations of the log price at
+# expiry (at least `min_width` each) on either side of each of them, so a $5 and a $5000
+# underlying get the same relative coverage. Half the points are spread geometrically
+# around these anchors; the other half are clustered around each strike, densest at the
+# strike itself (always a grid point), where the payoff has its kink at expiry and its
+# curvature before it.
+# The grid is built as segments: one per anchor, each depending only on that anchor (and
+# the number of anchors), so moving one strike changes one segment and leaves the others,
+# and the leg prices cached on them by memoized_evaluate_strategy, as they were.
+def adaptive_grid_segments(strategy, S0, T=0.0, sigma=0.25, n_points=150, span=4.0, min_width=0.075):
+    strikes = np.unique([float(leg.strike) for leg in strategy.legs if leg.strike > 0])
+    others = np.concatenate([[float(S0)] if S0 > 0 else [],
+                             [float(strategy.stock_price)] if strategy.stock_quantity and strategy.stock_price > 0 else []])
+    if not strikes.size and not others.size:
+        others = np.array([1.0])
+    spread = sigma * np.sqrt(max(T, 0.0))
+    width = span * max(spread, min_width)
+    per_anchor = max((n_points // 2) // (strikes.size + others.size), 16)
+    # Relative offsets of each anchor's segment, including the anchor itself
+    base = np.unique(np.append(np.geomspace(np.exp(-width), np.exp(width), per_anchor), 1.0))
+    segments = [anchor * base for anchor in others]
+    if strikes.size:
+        # An odd cluster size puts the strike itself on the grid
+        per_strike = max((n_points - n_points // 2) // strikes.size, 3)
+        per_strike -= 1 - per_strike % 2
+        cluster = np.exp(2 * max(spread, 0.01) * np.linspace(-1, 1, per_strike) ** 3)
+        segments += [strike * np.unique(np.concatenate([base, cluster])) for strike in strikes]
+    return segments
+
+# The sorted grid of adaptive_grid_segments
+def adaptive_price_grid(strategy, S0, T=0.0, sigma=0.25, n_points=150, span=4.0, min_width=0.075):
+    return np.unique(np.concatenate(adaptive_grid_segments(strategy, S0, T, sigma, n_points, span, min_width)))
+
+# Every price at which the strategy value crosses zero. The value is evaluated on `prices`
+# (a sorted grid, e.g. from adaptive_price_grid; `values` may pass its already computed
+# values) extended by a few points far below and above it. Each sign change brackets a
+# root, and all brackets are refined together with the Illinois variant of regula falsi,
+# one vectorized evaluation per iteration. At expiry the payoff is linear between the
+# strikes, so on a grid containing the strikes the first step is already exact. A run of
+# grid points where the value is exactly zero counts as one break-even at its first point;
+# zeros the value only touches without changing sign are not reported.
+def break_evens(strategy, prices, T, r, sigma, values=None, xtol=1e-10, max_iter=100):
+    prices = np.asarray(prices, dtype=float)
+    values = evaluate_strategy(strategy, prices, T, r, sigma) if values is None else np.asarray(values, dtype=float)
+    tails = np.concatenate([prices[0] * LOWER_TAIL, prices[-1] * UPPER_TAIL])
+    tail_values = evaluate_strategy(strategy, tails, T, r, sigma)
+    points = np.concatenate([tails[:1], prices, tails[1:]])
+    values = np.concatenate([tail_values[:1], values, tail_values[1:]])
+
+    nonzero = np.flatnonzero(values != 0)
+    left, right = nonzero[:-1], nonzero[1:]
+    crossing = np.sign(values[left]) != np.sign(values[right])
+    exact = points[left[crossing & (right - left > 1)] + 1]
+    bracketed = crossing & (right - left == 1)
+    a, b = points[left[bracketed]], points[right[bracketed]]
+    fa, fb = values[left[bracketed]], values[right[bracketed]]
+
+    roots = np.empty(a.size)
+    active = np.arange(a.size)
+    side = np.zeros(a.size, dtype=np.int8)
+    scale = max(np.abs(values).max(), 1.0)
+    for _ in range(max_iter):
+        if not active.size:
+            break
+        c = (a * fb - b * fa) / (fb - fa)
+        fc = evaluate_strategy(strategy, c, T, r, sigma)
+        done = (np.abs(fc) <= 1e-13 * scale) | (b - a <= xtol * np.maximum(1.0, np.abs(c)))
+        roots[active[done]] = c[done]
+        move_a = np.sign(fc) == np.sign(fa)
+        # Illinois: an endpoint kept twice in a row has its value halved, so one-sided
+        # convergence (regula falsi's weakness on convex stretches) cannot stall
+        fb = np.where(move_a & (side == 1), fb / 2, fb)
+        fa = np.where(~move_a & (side == -1), fa / 2, fa)
+        a, fa = np.where(move_a, c, a), np.where(move_a, fc, fa)
+        b, fb = np.where(move_a, b, c), np.where(move_a, fb, fc)
+        side = np.where(move_a, 1, -1).astype(np.int8)
+        keep = ~done
+        a, b, fa, fb, side, active = a[keep], b[keep], fa[keep], fb[keep], side[keep], active[keep]
+    if active.size:
+        roots[active] = (a + b) / 2
+    return np.sort(np.concatenate([exact, roots]))
+
+# Max profit and max loss of the strategy value function, with the prices where they are
+# reached. At expiry the payoff is piecewise linear with kinks at the strikes, so the
+# extremes are exact: the payoff at S = 0 and at every strike, or unbounded when the slope
+# beyond the highest strike (call weights plus shares) is positive (profit) or negative
+# (loss). Before expiry the value is evaluated on `prices`, interior grid extremes are
+# refined between their neighbours by refine_extremes, and the limits for S -> 0 and, when
+# the slope at infinity is zero, S -> infinity are taken in closed form.
+# Returns a dict with 'max_profit' and 'max_loss' (a loss as a positive amount; inf when
+# unlimited, and max_profit is negative when the strategy cannot make money) and the
+# prices 'max_profit_at' / 'max_loss_at' (0 or inf for the limits).
+def payoff_extremes(strategy, prices, T, r, sigma, values=None):
+    strikes, _, lattices, call_weights, put_weights, stock_weights, constants = strategy_weights([strategy], sigma)
+    call_weights, put_weights = call_weights[:, 0], put_weights[:, 0]
+    slope = call_weights.sum() + stock_weights[0]
+    flat = np.isclose(slope, 0.0)
+    # Calls are worth 0 and puts P as S -> 0; calls S - C and puts 0 as S -> infinity
+    put_limits, call_limits = limit_strikes(strikes, lattices, T, r)
+    at_zero = constants[0] + put_weights @ put_limits
+    at_infinity = constants[0] - call_weights @ call_limits
+
+    if T <= 0:
+        points = np.unique(strikes[strikes > 0])
+    else:
+        points = np.asarray(prices, dtype=float)
+    point_values = evaluate_strategy(strategy, points, T, r, sigma) if T <= 0 or values is None else np.asarray(values, dtype=float)
+
+    extremes = {}
+    for name, sign in (('max_profit', 1.0), ('max_loss', -1.0)):
+        if point_values.size and (flat or sign * slope < 0):
+            i = int(np.argmax(sign * point_values))
+            extremes[name] = (sign, i, points[i], point_values[i])
+    interior = [name for name, (_, i, _, _) in extremes.items() if T > 0 and 0 < i < points.size - 1]
+    if interior:
+        signs = np.array([extremes[name][0] for name in interior])
+        indices = np.array([extremes[name][1] for name in interior])
+        refined_at, refined_values = refine_extremes(strategy, T, r, sigma, points[indices - 1], points[indices + 1], signs)
+        for name, sign, at, value in zip(interior, signs, refined_at, refined_values):
+            if sign * value > sign * extremes[name][3]:
+                extremes[name] = (sign, extremes[name][1], at, value)
+
+    result = {}
+    for name, sign in (('max_profit', 1.0), ('max_loss', -1.0)):
+        if not flat and sign * slope > 0:
+            result[name], result[f'{name}_at'] = np.inf, np.inf
+            continue
+        best, best_at = at_zero, 0.0
+        if name in extremes and sign * extremes[name][3] > sign * best:
+            best_at, best = extremes[name][2:]
+        if flat and sign * at_infinity > sign * best:
+            best, best_at = at_infinity, np.inf
+        result[name], result[f'{name}_at'] = float(sign * best), float(best_at)
+    return result
+
+# Narrows each bracket [lows[k], highs[k]] around a maximum of signs[k] * value: every round
+# evaluates `n` points across all brackets in one call (a single induction for lattice
+# legs, where each evaluation costs the same for one point or thousands) and keeps the
+# neighbours of each bracket's best point, shrinking it (n - 1) / 2 times per round.
+# Returns the best prices and their values.
+def refine_extremes(strategy, T, r, sigma, lows, highs, signs, rounds=5, n=33):
+    rows = np.arange(len(signs))
+    for _ in range(rounds):
+        grid = np.linspace(lows, highs, n, axis=-1)
+        values = evaluate_strategy(strategy, grid, T, r, sigma)
+        best = np.argmax(signs[:, np.newaxis] * values, axis=1)
+        lows, highs = grid[rows, np.maximum(best - 1, 0)], grid[rows, np.minimum(best + 1, n - 1)]
+    return grid[rows, best], values[rows, best]
+
+# The strike amounts P and C in the limits of each column: puts are worth P as S -> 0 and
+# calls S - C as S -> infinity. Under Black-Scholes both are K e^{-rT}. An American put is
+# exercised at once as S -> 0 (P = K). A call on a dividend lattice also loses the
+# escrowed dividends, unless (American) exercising at once for S - K is worth more.
+def limit_strikes(strikes, lattices, T, r):
+    T = max(T, 0.0)
+    discounted = strikes * np.exp(-r * T)
+    put_limits, call_limits = discounted.copy(), discounted.copy()
+    for i, lattice in enumerate(lattices):
+        if lattice is None:
+            continue
+        call_limits[i] += escrowed_dividends(lattice.dividends, 0.0, r, T)
+        if lattice.american:
+            put_limits[i] = strikes[i]
+            call_limits[i] = min(call_limits[i], strikes[i])
+    return put_limits, call_limits
+
+# Break-evens and extremes of a strategy on a price grid, from one evaluation of the grid.
+# Returns the payoff_extremes dict plus 'break_evens' (sorted array of prices).
+def analyze_strategy(strategy, prices, T, r, sigma, values=None):
+    prices = np.asarray(prices, dtype=float)
+    values = evaluate_strategy(strategy, prices, T, r, sigma) if values is None else values
+    return {'break_evens': break_evens(strategy, prices, T, r, sigma, values),
+            **payoff_extremes(strategy, prices, T, r, sigma, values)}
@@ -0,0 +1,93 @@
+# Vectorized historical backtests of strategy templates
+import numpy as np
+import pandas as pd
+
+from .pricing import black_scholes_batch
+from .volatility import rolling_volatility
+
+# Strike templates for backtesting, relative to spot at entry: each leg is
+# (option_type, offset, quantity, position) with strike = spot * (1 + offset * width),
+# plus the number of shares held. They mirror the default layout of the page's inputs.
+STRATEGY_TEMPLATES = {
+    "Call": ([('call', 0, 1, 'long')], 0),
+    "Put": ([('put', 0, 1, 'long')], 0),
+    "Straddle": ([('call', 0, 1, 'long'), ('put', 0, 1, 'long')], 0),
+    "Covered Call": ([('call', 1, 1, 'short')], 1),
+    "Married Put": ([('put', -1, 1, 'long')], 1),
+    "Bull Call Spread": ([('call', 0, 1, 'long'), ('call', 1, 1, 'short')], 0),
+    "Bull Put Spread": ([('put', 0, 1, 'short'), ('put', -1, 1, 'long')], 0),
+    "Protective Collar": ([('put', -1, 1, 'long'), ('call', 1, 1, 'short')], 1),
+    "Long Call Butterfly Spread": ([('call', -1, 1, 'long'), ('call', 0, 2, 'short'), ('call', 1, 1, 'long')], 0),
+    "Iron Butterfly": ([('put', -1, 1, 'long'), ('put', 0, 1, 'short'), ('call', 0, 1, 'short'), ('call', 1, 1, 'long')], 0),
+    "Iron Condor": ([('put', -2, 1, 'long'), ('put', -1, 1, 'short'), ('call', 1, 1, 'short'), ('call', 2, 1, 'long')], 0),
+}
+
+# Vectorized backtest of several strategy templates on one price history. A position is
+# opened on every day that has `holding_days` of history after it (and a finite vol),
+# priced at Black-Scholes premiums on entry and marked to market daily until expiry.
+# Every entry date, holding day and unique strike offset is priced in a single
+# (entries x days x offsets) kernel call, shared by all strategies. `sigma` is a scalar
+# or one vol per bar (e.g. rolling historical vol known at entry).
+# Returns the entry indices and the P&L marks shaped (strategies, entries, holding_days + 1).
+def backtest_strategies(names, closes, holding_days=30, width=0.05, r=0.05, sigma=0.25, periods_per_year=252):
+    closes = np.asarray(closes, dtype=float)
+    sigma = np.broadcast_to(np.asarray(sigma, dtype=float), closes.shape)
+    if holding_days < 1 or holding_days >= len(closes):
+        return np.zeros(0, dtype=np.int64), np.zeros((len(names), 0, max(holding_days, 0) + 1))
+    entries = np.flatnonzero(np.isfinite(sigma[:len(closes) - holding_days]) & np.isfinite(closes[:len(closes) - holding_days]))
+    if entries.size == 0:
+        return entries, np.zeros((len(names), 0, holding_days + 1))
+    paths = np.lib.stride_tricks.sliding_window_view(closes, holding_days + 1)[entries]  # (entries, days)
+    spots = paths[:, 0]
+
+    offsets = sorted({offset for name in names for _, offset, _, _ in STRATEGY_TEMPLATES[name][0]})
+    call_weights = np.zeros((len(offsets), len(names)))
+    put_weights = np.zeros((len(offsets), len(names)))
+    stock_weights = np.zeros(len(names))
+    for j, name in enumerate(names):
+        legs, stock_weights[j] = STRATEGY_TEMPLATES[name]
+        for option_type, offset, quantity, position in legs:
+            weights = call_weights if option_type == 'call' else put_weights
+            weights[offsets.index(offset), j] += quantity if position == 'long' else -quantity
+
+    strikes = spots[:, np.newaxis] * (1 + np.array(offsets) * width)  # (entries, offsets)
+    time_left = (holding_days - np.arange(holding_days + 1)) / periods_per_year
+    call_prices, put_prices, _, _ = black_scholes_batch(paths[:, :, np.newaxis], strikes[:, np.newaxis, :],
+                                                         time_left[np.newaxis, :, np.newaxis], r,
+                                                         sigma[entries, np.newaxis, np.newaxis])
+    # Mark-to-market P&L: change in each option's value since entry, plus the stock
+    call_pnl = call_prices - call_prices[:, :1]
+    put_pnl = put_prices - put_prices[:, :1]
+    marks = call_pnl @ call_weights + put_pnl @ put_weights + (paths - spots[:, np.newaxis])[..., np.newaxis] * stock_weights
+    return entries, np.moveaxis(marks, -1, 0)
+
+# P&L distribution statistics for a set of backtest outcomes
+def backtest_summary(pnl):
+    pnl = np.asarray(pnl, dtype=float)
+    if pnl.size == 0:
+        return {'Trades': 0}
+    p5, p25, p50, p75, p95 = np.percentile(pnl, [5, 25, 50, 75, 95])
+    return {'Trades': pnl.size, 'Mean P&L': pnl.mean(), 'Std P&L': pnl.std(ddof=1) if pnl.size > 1 else 0.0,
+            'Win Rate': np.mean(pnl > 0), 'Worst': pnl.min(), '5%': p5, '25%': p25, 'Median': p50, '75%': p75,
+            '95%': p95, 'Best': pnl.max()}
+
+# Backtests every strategy template on every symbol. P&L is also reported as a
+# percentage of the entry spot so symbols at different price levels are comparable.
+def backtest_sweep(frames, names=None, holding_days=30, width=0.05, r=0.05, vol_window=20, sigma=None):
+    names = list(STRATEGY_TEMPLATES) if names is None else names
+    rows = []
+    for symbol, frame in frames.items():
+        if frame.empty:
+            continue
+        closes = frame['Close'].to_numpy(dtype=float)
+        if sigma is None:
+            bars = [frame[field].to_numpy(dtype=float)[:, np.newaxis] for field in ('Open', 'High', 'Low', 'Close')]
+            vols = rolling_volatility(*bars, window=vol_window, estimator='Close-to-Close')[:, 0]
+        else:
+            vols = sigma
+        entries, marks = backtest_strategies(names, closes, holding_days, width, r, vols)
+        for name, strategy_marks in zip(names, marks):
+            final_pnl = strategy_marks[:, -1]
+            rows.append({'Symbol': symbol, 'Strategy': name, **backtest_summary(final_pnl),
+                         'Mean P&L %': np.mean(final_pnl / closes[entries]) if entries.size else np.nan})
+    return pd.DataFrame(rows)
@@ -0,0 +1,186 @@
+# Batch evaluation of strategy configurations, shared by the CLI and the HTTP endpoint.
+# A config is a flat dict: either `strategy` (a built-in name) plus that builder's inputs
+# (missing ones take the same defaults as the page), or `legs` (a list of leg dicts, or
+# its JSON text in CSV files) plus optional stock_quantity and stock_price. The pricing
+# inputs are asset_price, T in years (or days_to_expiry), r, sigma and the payoff grid
+# price_min / price_max / points, which defaults to the page's strike +/- 100.
+import json
+import math
+import multiprocessing
+import os
+import sys
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from .pricing import black_scholes_greeks
+from .strategies import STRATEGIES, Leg, Strategy, build_strategy, evaluate_strategies, leg_column
+
+CONFIG_DEFAULTS = {'r': 0.05, 'sigma': 0.25, 'premium': 10.0, 'days_to_expiry': 30, 'points': 100}
+RESULT_FIELDS = ['id', 'strategy', 'asset_price', 'T', 'r', 'sigma', 'value', 'delta', 'gamma', 'vega', 'theta', 'rho',
+                 'min_pnl', 'max_pnl', 'price_min', 'price_max', 'error']
+GRID_FIELDS = ['prices', 'payoffs']
+
+# Config rows with blank cells (NaN from CSV/Parquet, None from JSON) dropped
+def clean_config(config):
+    if not isinstance(config, dict):
+        raise TypeError(f'expected a config object, got {type(config).__name__}')
+    return {key: value for key, value in config.items()
+            if value is not None and not (isinstance(value, float) and math.isnan(value))}
+
+def strategy_from_config(config):
+    if 'legs' in config:
+        legs = json.loads(config['legs']) if isinstance(config['legs'], str) else config['legs']
+        return Strategy('Custom', tuple(Leg(leg['option_type'], float(leg['strike']), float(leg.get('premium', 0.0)),
+                                            float(leg.get('quantity', 1)), leg.get('position', 'long'),
+                                            None if leg.get('sigma') is None else float(leg['sigma']))
+                                        for leg in legs),
+                        stock_quantity=float(config.get('stock_quantity', 0)), stock_price=float(config.get('stock_price', 0.0)))
+    name = config.get('strategy')
+    if name not in STRATEGIES:
+        raise ValueError(f'Unknown strategy {name!r}; expected one of {", ".join(STRATEGIES)} or a list of legs')
+    strike_price = float(config.get('strike_price', config['asset_price']))
+    params = {'strike_price': strike_price, 'premium': float(config.get('premium', CONFIG_DEFAULTS['premium']))}
+    for param, _, default, _ in STRATEGIES[name][2]:
+        params[param] = float(config.get(param, default(strike_price, float(config['asset_price']))))
+    return build_strategy(name, params)
+
+# Inputs accepted by each built-in strategy
+def strategy_inputs():
+    return {name: ['strike_price', 'premium'] + [param for param, _, _, _ in inputs]
+            for name, (_, _, inputs) in STRATEGIES.items()}
+
+# Pricing inputs of a config: (asset_price, T, r, sigma, price grid)
+def pricing_inputs(config):
+    asset_price = float(config['asset_price'])
+    T = float(config['T']) if 'T' in config else float(config.get('days_to_expiry', CONFIG_DEFAULTS['days_to_expiry'])) / 365
+    center = float(config.get('strike_price', asset_price))
+    points = int(config.get('points', CONFIG_DEFAULTS['points']))
+    if points < 2:
+        raise ValueError(f'points must be at least 2, got {points}')
+    prices = np.linspace(float(config.get('price_min', max(0, center - 100))), float(config.get('price_max', center + 100)), points)
+    return asset_price, T, float(config.get('r', CONFIG_DEFAULTS['r'])), float(config.get('sigma', CONFIG_DEFAULTS['sigma'])), prices
+
+# Evaluates one chunk of configs. Configs sharing T, r, sigma and price grid are priced
+# together in one evaluate_strategies call; value and Greeks are taken at asset_price.
+# A config that fails to parse or price yields a record with its `error` instead of
+# stopping the batch. Takes a single tuple so it can be mapped over a process pool.
+def evaluate_chunk(task):
+    first_id, configs, include_grid = task
+    records = [None] * len(configs)
+    groups = {}
+    for i, config in enumerate(configs):
+        record = dict.fromkeys(RESULT_FIELDS + (GRID_FIELDS if include_grid else []))
+        record['id'] = first_id + i
+        records[i] = record
+        try:
+            config = clean_config(config)
+            record['id'] = config.get('id', first_id + i)
+            record['strategy'] = config.get('strategy', 'Custom' if 'legs' in config else None)
+            strategy = strategy_from_config(config)
+            asset_price, T, r, sigma, prices = pricing_inputs(config)
+        except (KeyError, TypeError, ValueError) as exc:
+            record['error'] = f'{type(exc).__name__}: {exc}'
+            continue
+        record.update(asset_price=asset_price, T=T, r=r, sigma=sigma, price_min=float(prices[0]), price_max=float(prices[-1]))
+        key = (T, r, sigma, float(prices[0]), float(prices[-1]), len(prices))
+        groups.setdefault(key, (prices, []))[1].append((i, strategy))
+
+    for (T, r, sigma, _, _, _), (prices, members) in groups.items():
+        strategies = [strategy for _, strategy in members]
+        payoffs = evaluate_strategies(strategies, prices, T, r, sigma)
+        greeks = greeks_at_spots(strategies, [records[i]['asset_price'] for i, _ in members], T, r, sigma)
+        for k, ((i, strategy), payoff) in enumerate(zip(members, payoffs)):
+            record = records[i]
+            record.update({name: float(values[k]) for name, values in greeks.items()})
+            record.update(min_pnl=float(payoff.min()), max_pnl=float(payoff.max()))
+            if include_grid:
+                record.update(prices=prices.tolist(), payoffs=payoff.tolist())
+    return records
+
+# Value and Greeks of many strategies, each at its own spot, in one kernel call: every leg
+# is priced at its strategy's spot and the legs are summed per strategy with bincount
+def greeks_at_spots(strategies, spots, T, r, sigma):
+    spots = np.asarray(spots, dtype=float)
+    legs = [(j, leg) for j, strategy in enumerate(strategies) for leg in strategy.legs]
+    owners = np.array([j for j, _ in legs], dtype=np.int64)
+    columns = np.array([leg_column(leg, sigma)[:2] for _, leg in legs], dtype=float).reshape(-1, 2)
+    weights = np.array([leg.weight for _, leg in legs], dtype=float)
+    is_call = np.array([leg.option_type == 'call' for _, leg in legs], dtype=bool)
+    greeks = black_scholes_greeks(spots[owners], columns[:, 0], T, r, columns[:, 1])
+    result = {name: np.bincount(owners, weights=weights * np.where(is_call, calls, puts), minlength=len(strategies))
+              for name, (calls, puts) in greeks.items()}
+    stock_quantities = np.array([strategy.stock_quantity for strategy in strategies], dtype=float)
+    premiums = np.bincount(owners, weights=weights * np.array([leg.premium for _, leg in legs], dtype=float), minlength=len(strategies))
+    stock_costs = stock_quantities * np.array([strategy.stock_price for strategy in strategies], dtype=float)
+    result['value'] = result.pop('price') - premiums + stock_quantities * spots - stock_costs
+    result['delta'] = result['delta'] + stock_quantities
+    return result
+
+# Evaluates a stream of config chunks and yields the result records chunk by chunk, in
+# input order. With workers > 1 chunks go to a process pool, with at most two chunks per
+# worker in flight, so arbitrarily long inputs are streamed in bounded memory.
+def evaluate_stream(chunks, workers=1, include_grid=False):
+    tasks = _chunk_tasks(chunks, include_grid)
+    if workers <= 1:
+        for task in tasks:
+            yield evaluate_chunk(task)
+        return
+    context = multiprocessing.get_context('fork') if 'fork' in multiprocessing.get_all_start_methods() else None
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context) as pool:
+        pending = deque()
+        for task in tasks:
+            pending.append(pool.submit(evaluate_chunk, task))
+            if len(pending) >= 2 * workers:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+def _chunk_tasks(chunks, include_grid):
+    first_id = 0
+    for configs in chunks:
+        yield first_id, configs, include_grid
+        first_id += len(configs)
+
+def evaluate_configs(configs, include_grid=False):
+    return evaluate_chunk((0, list(configs), include_grid))
+
+def chunked(items, chunk_size):
+    chunk = []
+    for item in items:
+        chunk.append(item)
+        if len(chunk) == chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+# Reads configs from CSV, JSON (a list of configs), JSON lines or Parquet in chunks of
+# `chunk_size` rows, without loading the whole file for the streaming formats. '-' reads
+# JSON lines from stdin.
+def read_configs(path, chunk_size=1000):
+    extension = os.path.splitext(path)[1].lower()
+    if path == '-' or extension in ('.jsonl', '.ndjson'):
+        stream = sys.stdin if path == '-' else open(path)
+        try:
+            yield from chunked((json.loads(line) for line in stream if line.strip()), chunk_size)
+        finally:
+            if stream is not sys.stdin:
+                stream.close()
+    elif extension == '.csv':
+        import pandas as pd
+
+        for frame in pd.read_csv(path, chunksize=chunk_size):
+            yield frame.to_dict('records')
+    elif extension == '.json':
+        with open(path) as f:
+            configs = json.load(f)
+        yield from chunked([configs] if isinstance(configs, dict) else configs, chunk_size)
+    elif extension == '.parquet':
+        import pyarrow.parquet as pq
+
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunk_size):
+            yield batch.to_pylist()
+    else:
+        raise ValueError(f'Unsupported config file {path!r}: expected .csv, .json, .jsonl/.ndjson or .parquet')
@@ -0,0 +1,110 @@
+# Bounded caches for rendered charts and memoized payoffs
+import hashlib
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+from .pricing import price_legs
+from .strategies import strategy_weights
+
+# Bounded, thread-safe LRU cache shared by all sessions (rendered charts, payoff arrays).
+# Values must be immutable or only ever read, e.g. PNG bytes, figures that are only
+# displayed or read-only arrays, so memory stays bounded however many reruns and
+# sessions there are.
+class LRUCache:
+    def __init__(self, max_entries=64):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            if key not in self.entries:
+                return None
+            self.entries.move_to_end(key)
+            return self.entries[key]
+
+    def put(self, key, value):
+        with self.lock:
+            self.entries[key] = value
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+        return value
+
+    def get_or_create(self, key, build):
+        value = self.get(key)
+        return self.put(key, build()) if value is None else value
+
+# Cache key for a chart spec (or any mix of arrays and plain values)
+def cache_key(*parts):
+    digest = hashlib.sha1()
+    for part in parts:
+        if isinstance(part, dict):
+            part = tuple(sorted(part.items()))
+        for item in part if isinstance(part, tuple) else (part,):
+            digest.update(np.ascontiguousarray(item).tobytes() if isinstance(item, np.ndarray) else repr(item).encode())
+    return digest.hexdigest()
+
+# Strategy legs as a canonical, hashable key: plain rounded floats, sorted legs, no name
+def normalize_strategy(strategy):
+    legs = tuple(sorted((leg.option_type, leg.position, round(float(leg.strike), 6), round(float(leg.premium), 6),
+                         round(float(leg.quantity), 6), None if leg.sigma is None else round(float(leg.sigma), 8), repr(leg.lattice))
+                        for leg in strategy.legs))
+    return legs, round(float(strategy.stock_quantity), 6), round(float(strategy.stock_price), 6)
+
+# evaluate_strategy with two levels of memoization in `cache`: whole payoff arrays keyed
+# on the normalized strategy and pricing inputs, and the priced (call, put) columns of
+# each (strike, vol, lattice) triple. A change to a premium or quantity only re-weights
+# cached columns without pricing anything. Columns are cached per segment of the grid
+# (`segments`, e.g. from adaptive_grid_segments, whose union is the sorted `asset_prices`;
+# by default the whole grid is one segment), so when a moved strike changes only its own
+# segment, the new strike's column is priced on the whole grid and the other columns
+# just on the new segment.
+def memoized_evaluate_strategy(strategy, asset_prices, T, r, sigma, cache, segments=None):
+    asset_prices = np.asarray(asset_prices, dtype=float)
+    inputs = (round(float(T), 10), round(float(r), 10))
+    if segments is None:
+        placements = [(asset_prices, Ellipsis)]
+    else:
+        placements = [(segment, np.searchsorted(asset_prices, segment))
+                      for segment in (np.asarray(segment, dtype=float) for segment in segments)]
+
+    def build():
+        strikes, vols, lattices, call_weights, put_weights, stock_weights, constants = strategy_weights([strategy], sigma)
+        calls = np.empty(asset_prices.shape + strikes.shape)
+        puts = np.empty(asset_prices.shape + strikes.shape)
+        segment_keys = [cache_key(segment) for segment, _ in placements]
+        keys = [[('leg', strike, vol, lattice, segment_key) + inputs for strike, vol, lattice in zip(strikes, vols, lattices)]
+                for segment_key in segment_keys]
+        columns = [[cache.get(key) for key in column_keys] for column_keys in keys]
+        # Segments missing the same columns are priced together, in one call
+        missing = {}
+        for k, segment_columns in enumerate(columns):
+            columns_missing = tuple(i for i, column in enumerate(segment_columns) if column is None)
+            if columns_missing:
+                missing.setdefault(columns_missing, []).append(k)
+        for columns_missing, segment_indices in missing.items():
+            columns_missing = list(columns_missing)
+            if len(segment_indices) == 1:
+                prices, pieces = placements[segment_indices[0]][0], [Ellipsis]
+            else:
+                prices = np.concatenate([placements[k][0] for k in segment_indices])
+                offsets = np.cumsum([0] + [len(placements[k][0]) for k in segment_indices])
+                pieces = [slice(start, stop) for start, stop in zip(offsets[:-1], offsets[1:])]
+            call_prices, put_prices = price_legs(prices, strikes[columns_missing], T, r, vols[columns_missing],
+                                                 [lattices[i] for i in columns_missing])
+            for k, piece in zip(segment_indices, pieces):
+                for j, i in enumerate(columns_missing):
+                    columns[k][i] = cache.put(keys[k][i], (call_prices[..., j][piece].copy(), put_prices[..., j][piece].copy()))
+        for (_, positions), segment_columns in zip(placements, columns):
+            for i, (call_column, put_column) in enumerate(segment_columns):
+                calls[..., i][positions] = call_column
+                puts[..., i][positions] = put_column
+        payoffs = np.asarray(constants[0] + stock_weights[0] * asset_prices + calls @ call_weights[:, 0] + puts @ put_weights[:, 0])
+        payoffs.flags.writeable = False
+        return payoffs
+
+    context = (cache_key(asset_prices),) + inputs
+    return cache.get_or_create(('payoff', normalize_strategy(strategy), round(float(sigma), 10), context), build)
@@ -0,0 +1,93 @@
+# Library-independent payoff chart specs and their matplotlib / Plotly renderers
+import io
+
+import numpy as np
+import plotly.graph_objects as go
+
+# Min/max-preserving downsampling for plotting: the series is split into buckets and the
+# first, lowest, highest and last point of each bucket are kept, so peaks, troughs and
+# kinks survive while at most ~max_points points are sent to the browser.
+def downsample_minmax(x, y, max_points=2000):
+    x, y = np.asarray(x), np.asarray(y)
+    if len(y) <= max_points:
+        return x, y
+    bucket = int(np.ceil(len(y) / (max_points // 4)))
+    padded = np.pad(y, (0, -len(y) % bucket), mode='edge').reshape(-1, bucket)
+    starts = np.arange(padded.shape[0]) * bucket
+    keep = np.concatenate([starts, starts + padded.argmin(axis=1), starts + padded.argmax(axis=1),
+                           np.minimum(starts + bucket - 1, len(y) - 1)])
+    keep = np.unique(np.minimum(keep, len(y) - 1))
+    return x[keep], y[keep]
+
+# Everything needed to draw a payoff chart, independent of the plotting library: the
+# curve, profit/loss shading masks and labelled reference lines ('h' or 'v', position,
+# colour, label). `analytics` (from analyze_strategy) adds the break-evens and the finite
+# max profit / max loss as reference lines.
+def payoff_chart_spec(strategy, x, y, label, analytics=None):
+    spec = {'x': x, 'y': y, 'label': label, 'title': f'{strategy} Payoff at Different Prices',
+            'ylabel': 'Profit / Loss (USD) x 100', 'profit': y > 0, 'lines': []}
+    if strategy == "Protective Collar":
+        spec.update(title='Protective Collar Strategy Payoff', ylabel='Profit / Loss (USD)')
+    if analytics is not None:
+        spec['lines'] += [('v', break_even, 'purple', f'Break-Even ${break_even:.2f}') for break_even in analytics['break_evens']]
+        if np.isfinite(analytics['max_profit']):
+            spec['lines'].append(('h', analytics['max_profit'], 'blue', f"Max Profit: ${analytics['max_profit']:.2f}"))
+        if np.isfinite(analytics['max_loss']):
+            spec['lines'].append(('h', -analytics['max_loss'], 'orange', f"Max Loss: ${-analytics['max_loss']:.2f}"))
+    return spec
+
+# Renders a payoff chart to PNG with a standalone matplotlib Figure. Nothing is registered
+# with pyplot, so the figure and its canvas are freed as soon as this returns.
+def render_payoff_png(spec):
+    from matplotlib.figure import Figure
+
+    fig = Figure()
+    ax = fig.subplots()
+    x, y = spec['x'], spec['y']
+    ax.plot(x, y, label=spec['label'])
+    ax.axhline(0, color='grey', lw=1)
+    ax.fill_between(x, y, 0, where=spec['profit'], color='green', alpha=0.3, interpolate=True)
+    ax.fill_between(x, y, 0, where=~spec['profit'], color='red', alpha=0.3, interpolate=True)
+    for orientation, position, color, label in spec['lines']:
+        line = ax.axhline if orientation == 'h' else ax.axvline
+        line(position, color=color, linestyle='--', label=label)
+    ax.set_xlabel('Stock Price (USD)')
+    ax.set_ylabel(spec['ylabel'])
+    ax.set_title(spec['title'])
+    ax.legend()
+    fig.tight_layout()
+    buffer = io.BytesIO()
+    fig.savefig(buffer, format='png')
+    return buffer.getvalue()
+
+# Draws a payoff chart into a Plotly figure. Passing the figure from the previous rerun
+# reuses it: the three traces (curve, profit and loss shading) only get new data and the
+# reference lines are replaced, instead of building a new figure.
+def render_payoff_plotly(spec, fig=None):
+    x, y = spec['x'], spec['y']
+    traces = [dict(x=x, y=y, name=spec['label']),
+              dict(x=x, y=np.where(spec['profit'], y, np.nan), name='Profit'),
+              dict(x=x, y=np.where(spec['profit'], np.nan, y), name='Loss')]
+    if fig is None:
+        fig = go.Figure([go.Scatter(mode='lines', line=dict(color='royalblue')),
+                         go.Scatter(mode='none', fill='tozeroy', fillcolor='rgba(0, 128, 0, 0.3)'),
+                         go.Scatter(mode='none', fill='tozeroy', fillcolor='rgba(255, 0, 0, 0.3)')])
+    for trace, data in zip(fig.data, traces):
+        trace.update(data)
+    fig.layout.shapes = ()
+    fig.layout.annotations = ()
+    fig.add_hline(0, line_color='grey', line_width=1)
+    for orientation, position, color, label in spec['lines']:
+        add_line = fig.add_hline if orientation == 'h' else fig.add_vline
+        add_line(position, line_color=color, line_dash='dash', annotation_text=label)
+    fig.update_layout(title=spec['title'], xaxis_title='Stock Price (USD)', yaxis_title=spec['ylabel'])
+    return fig
+
+def candlestick_figure(symbol, stock_data):
+    fig_candlestick = go.Figure(data=[go.Candlestick(x=stock_data['Date'],
+                                                     open=stock_data['Open'],
+                                                     high=stock_data['High'],
+                                                     low=stock_data['Low'],
+                                                     close=stock_data['Close'])])
+    fig_candlestick.update_layout(title=f'Candlestick Chart for {symbol}', xaxis_title='Date', yaxis_title='Price (USD)')
+    return fig_candlestick
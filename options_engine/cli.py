@@ -0,0 +1,69 @@
+# Command line entry point:
+#   python -m options_engine evaluate configs.csv -o results.jsonl --workers 4
+#   python -m options_engine serve --port 8765
+#   python -m options_engine strategies
+# Results are written chunk by chunk as JSON lines (or CSV when the output ends in .csv).
+import argparse
+import csv
+import json
+import os
+import sys
+
+from .batch import GRID_FIELDS, RESULT_FIELDS, evaluate_stream, read_configs, strategy_inputs
+
+def write_results(chunks, out, output_format='jsonl', include_grid=False):
+    count = 0
+    if output_format == 'csv':
+        writer = csv.DictWriter(out, fieldnames=RESULT_FIELDS + (GRID_FIELDS if include_grid else []))
+        writer.writeheader()
+    for records in chunks:
+        for record in records:
+            if output_format == 'csv':
+                writer.writerow({key: json.dumps(value) if isinstance(value, list) else value for key, value in record.items()})
+            else:
+                out.write(json.dumps(record) + '\n')
+        out.flush()
+        count += len(records)
+    return count
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='options_engine', description='Headless option strategy evaluation')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    evaluate = commands.add_parser('evaluate', help='evaluate strategy configs from a CSV, JSON, JSON lines or Parquet file')
+    evaluate.add_argument('configs', help="config file, or '-' for JSON lines on stdin")
+    evaluate.add_argument('-o', '--output', default='-', help="output file (default: stdout)")
+    evaluate.add_argument('--format', choices=['jsonl', 'csv'], help='output format (default: from the output file name)')
+    evaluate.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    evaluate.add_argument('--chunk-size', type=int, default=1000)
+    evaluate.add_argument('--grid', action='store_true', help='include the payoff grid of every config')
+
+    serve = commands.add_parser('serve', help='serve POST /evaluate on a local HTTP endpoint')
+    serve.add_argument('--host', default='127.0.0.1')
+    serve.add_argument('--port', type=int, default=8765)
+    serve.add_argument('--chunk-size', type=int, default=1000)
+
+    commands.add_parser('strategies', help='list the built-in strategies and their inputs')
+    args = parser.parse_args(argv)
+
+    if args.command == 'strategies':
+        json.dump(strategy_inputs(), sys.stdout, indent=1)
+        sys.stdout.write('\n')
+    elif args.command == 'serve':
+        from .server import serve as run_server
+
+        run_server(args.host, args.port, args.chunk_size)
+    else:
+        output_format = args.format or ('csv' if args.output.lower().endswith('.csv') else 'jsonl')
+        out = sys.stdout if args.output == '-' else open(args.output, 'w', newline='')
+        try:
+            chunks = evaluate_stream(read_configs(args.configs, args.chunk_size), args.workers, args.grid)
+            count = write_results(chunks, out, output_format, args.grid)
+        finally:
+            if out is not sys.stdout:
+                out.close()
+        print(f'Evaluated {count} configs', file=sys.stderr)
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,158 @@
+# Binomial (Cox-Ross-Rubinstein) and trinomial lattices for American and European options,
+# with optional discrete cash dividends under the escrowed-dividend model
+from dataclasses import dataclass
+
+import numpy as np
+
+# Lattice settings of an option leg (Leg.lattice); legs without one are priced with
+# Black-Scholes. `dividends` are (time in years, cash amount) pairs from the valuation
+# date. Under the escrowed model the lattice is built on the spot less the present value
+# of the dividends paid before expiry, and the dividends still to come are added back
+# wherever the option may be exercised.
+@dataclass(frozen=True)
+class Lattice:
+    method: str = 'binomial'  # 'binomial' (Cox-Ross-Rubinstein) or 'trinomial'
+    steps: int = 500
+    american: bool = True
+    dividends: tuple = ()
+
+# Regular dividends of `amount` every `interval` years from `first_time` until T
+def dividend_schedule(amount, first_time, T, interval=0.25):
+    if amount <= 0:
+        return ()
+    return tuple((float(time), float(amount)) for time in np.arange(first_time, T, interval) if time > 0)
+
+# Present value at time t of the dividends paid after t and no later than `horizon`
+def escrowed_dividends(dividends, t, r, horizon):
+    t = np.asarray(t, dtype=float)
+    total = np.zeros(t.shape)
+    for time, amount in dividends:
+        if 0 < time <= horizon:
+            total = total + np.where(time > t, amount * np.exp(-r * (time - t)), 0.0)
+    return total
+
+# Up/middle/down transition probabilities and log-price spacing of one step of length dt
+def lattice_parameters(method, dt, r, sigma):
+    if method == 'binomial':
+        dx = sigma * np.sqrt(dt)
+        p_up = (np.exp(r * dt) - np.exp(-dx)) / (np.exp(dx) - np.exp(-dx))
+        p_mid, p_down = 0.0, 1.0 - p_up
+    elif method == 'trinomial':
+        dx = sigma * np.sqrt(3 * dt)
+        drift = (r - 0.5 * sigma**2) * np.sqrt(dt / (12 * sigma**2))
+        p_up, p_mid, p_down = 1 / 6 + drift, 2 / 3, 1 / 6 - drift
+    else:
+        raise ValueError(f"Unknown lattice method {method!r}; expected 'binomial' or 'trinomial'")
+    if min(p_up, p_mid, p_down) < 0:
+        raise ValueError(f'Negative {method} probabilities at {dt:.3g} years per step; use more steps')
+    return dx, p_up, p_mid, p_down
+
+# Lattice prices of every point of S against every strike in K, shaped
+# np.broadcast_shapes(np.shape(S), np.shape(T)) + (len(K),) like price_legs. `option_type`
+# is 'call'/'put' or one per strike; sigma is a single vol.
+# Instead of one tree per spot, all spots share one lattice of log-price nodes x0 + k dx:
+# backward induction over the node range covering every spot (plus one node per
+# remaining step on each side) prices a tree rooted at every node at once, and each spot
+# is read off between its two neighbouring nodes (the first spot sits exactly on a node).
+# Only the current layer, strikes x (spot range / dx + 2 steps) nodes, is kept in memory.
+# Expiries in T are layers of one tree built for the longest of them, with
+# dt = max(T) / steps, so a whole price x time-to-expiry surface is a single induction;
+# dividend times are measured from the valuation date of that longest expiry.
+def lattice_price(S, K, T, r, sigma, lattice, option_type='call'):
+    S = np.asarray(S, dtype=float)
+    T = np.maximum(np.asarray(T, dtype=float), 0.0)
+    K = np.atleast_1d(np.asarray(K, dtype=float))
+    shape = np.broadcast_shapes(S.shape, T.shape)
+    S, T = np.broadcast_to(S, shape).ravel(), np.broadcast_to(T, shape).ravel()
+    sign = np.where(np.broadcast_to(np.asarray(option_type) == 'call', K.shape), 1.0, -1.0)[:, np.newaxis]
+    # Expired points keep their intrinsic value
+    prices = np.maximum(sign * (S - K[:, np.newaxis]), 0.0)
+    horizon = T.max() if T.size else 0.0
+    if horizon > 0 and K.size:
+        steps = int(lattice.steps)
+        dt = horizon / steps
+        dx, p_up, p_mid, p_down = lattice_parameters(lattice.method, dt, r, float(sigma))
+        discount = np.exp(-r * dt)
+        layers = np.rint(T / dt).astype(np.int64)
+        escrowed = S - escrowed_dividends(lattice.dividends, horizon - layers * dt, r, horizon)
+        log_spots = np.log(np.maximum(escrowed, 1e-8 * max(escrowed.max(), 1.0)))
+        offsets = (log_spots - log_spots[0]) / dx
+        low, high = int(np.floor(offsets.min())), int(np.ceil(offsets.max()))
+        nodes = np.exp(log_spots[0] + np.arange(low - steps, high + steps + 1) * dx)
+
+        order = np.argsort(layers, kind='stable')
+        wanted = np.unique(layers[order], return_index=True)
+        wanted = dict(zip(wanted[0].tolist(), np.split(order, wanted[1][1:])))
+        values = np.maximum(sign * (nodes - K[:, np.newaxis]), 0.0)
+        for j in range(1, steps + 1):
+            if p_mid:
+                values = discount * (p_up * values[:, 2:] + p_mid * values[:, 1:-1] + p_down * values[:, :-2])
+            else:
+                values = discount * (p_up * values[:, 2:] + p_down * values[:, :-2])
+            if lattice.american:
+                spots = nodes[j:nodes.size - j] + escrowed_dividends(lattice.dividends, horizon - j * dt, r, horizon)
+                values = np.maximum(values, sign * (spots - K[:, np.newaxis]))
+            if j in wanted:
+                points = wanted[j]
+                position = offsets[points] - (low - steps + j)
+                i = np.clip(np.floor(position).astype(np.int64), 0, values.shape[1] - 2)
+                weight = position - i
+                for row, row_values in enumerate(values):
+                    prices[row, points] = row_values[i] + weight * (row_values[i + 1] - row_values[i])
+    return np.moveaxis(prices, 0, -1).reshape(shape + K.shape)
+
+# Lattice price and Greeks, shaped like lattice_price. Delta and gamma come from spots
+# one node spacing apart and theta from the layer one step closer to expiry of the same
+# induction (two nodes and two steps on the binomial lattice, so the values compared come
+# from trees with the same strike alignment), vega and rho from central bumps of sigma
+# and r. Units follow black_scholes_greeks: per unit of vol and rate, theta per year.
+def lattice_greeks(S, K, T, r, sigma, lattice, option_type='call', vol_bump=0.01, rate_bump=1e-4):
+    S = np.asarray(S, dtype=float)
+    T = np.maximum(np.asarray(T, dtype=float), 0.0)
+    shape = np.broadcast_shapes(S.shape, T.shape)
+    S, T = np.broadcast_to(S, shape), np.broadcast_to(T, shape)
+    horizon = T.max() if T.size else 0.0
+    stride = 2 if lattice.method == 'binomial' else 1
+    dt = horizon / lattice.steps if horizon > 0 else 0.0
+    spacing = stride * lattice_parameters(lattice.method, dt, r, float(sigma))[0] if dt else 1e-4
+    earlier = np.maximum(T - stride * dt, 0.0)
+    up, down = S * np.exp(spacing), S * np.exp(-spacing)
+    price, price_up, price_down, price_earlier = np.split(
+        lattice_price(np.stack([S, up, down, S]), K, np.stack([T, T, T, earlier]), r, sigma, lattice, option_type), 4)
+    price, price_up, price_down, price_earlier = (values[0] for values in (price, price_up, price_down, price_earlier))
+    S, up, down, elapsed = (x[..., np.newaxis] for x in (S, up, down, T - earlier))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        slope_up, slope_down = (price_up - price) / (up - S), (price - price_down) / (S - down)
+        theta = np.where(elapsed > 0, (price_earlier - price) / elapsed, 0.0)
+    vol_up, vol_down = (lattice_price(S[..., 0], K, T, r, sigma + bump, lattice, option_type) for bump in (vol_bump, -vol_bump))
+    rate_up, rate_down = (lattice_price(S[..., 0], K, T, r + bump, sigma, lattice, option_type) for bump in (rate_bump, -rate_bump))
+    return {
+        'price': price,
+        'delta': (price_up - price_down) / (up - down),
+        'gamma': 2 * (slope_up - slope_down) / (up - down),
+        'vega': (vol_up - vol_down) / (2 * vol_bump),
+        'theta': theta,
+        'rho': (rate_up - rate_down) / (2 * rate_bump),
+    }
+
+# Lattice prices (or Greeks) of the columns of a leg matrix that have a lattice: yields
+# (column indices, calls, puts) per group of columns sharing a lattice and vol, each group
+# priced as one induction over its call and put strikes. With greeks=True calls and puts
+# are dicts of lattice_greeks results.
+def lattice_columns(asset_prices, strikes, T, r, sigma, lattices, greeks=False):
+    strikes = np.asarray(strikes, dtype=float)
+    vols = np.broadcast_to(np.asarray(sigma, dtype=float), strikes.shape)
+    groups = {}
+    for i, lattice in enumerate(lattices):
+        if lattice is not None:
+            groups.setdefault((lattice, float(vols[i])), []).append(i)
+    for (lattice, vol), columns in groups.items():
+        group_strikes = strikes[columns]
+        option_types = ['call'] * len(columns) + ['put'] * len(columns)
+        function = lattice_greeks if greeks else lattice_price
+        result = function(asset_prices, np.concatenate([group_strikes, group_strikes]), T, r, vol, lattice, option_types)
+        if greeks:
+            yield (columns, {name: values[..., :len(columns)] for name, values in result.items()},
+                   {name: values[..., len(columns):] for name, values in result.items()})
+        else:
+            yield columns, result[..., :len(columns)], result[..., len(columns):]
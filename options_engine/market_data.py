@@ -0,0 +1,178 @@
+# Market data: providers, the local SQLite bar store and the background warmer
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import pandas as pd
+
+BAR_COLUMNS = ['Date', 'Open', 'High', 'Low', 'Close']
+SYMBOLS = ["AAPL", "MSFT", "GOOGL", "AMZN", "SPY", "QQQ", "DIA", "META", "NFLX", "NVDA", "TSLA", "AMD"]
+
+# Market data providers. fetch_bars returns the OHLC bars of one symbol from `start`
+# (inclusive) onwards as a DataFrame with Date, Open, High, Low and Close columns.
+class MarketDataProvider:
+    def fetch_bars(self, symbol, start, interval='1d'):
+        raise NotImplementedError
+
+class YahooFinanceProvider(MarketDataProvider):
+    def fetch_bars(self, symbol, start, interval='1d'):
+        # Imported on first use; offline and headless runs never need it
+        import yfinance as yf
+
+        # Download historical market data from Yahoo Finance
+        data = yf.download(symbol, start=start, interval=interval, progress=False)
+        if isinstance(data.columns, pd.MultiIndex):
+            data = data.droplevel(1, axis=1)
+        data = data.reset_index().rename(columns={'Datetime': 'Date'})
+        if data.empty:
+            return pd.DataFrame(columns=BAR_COLUMNS)
+        return data[BAR_COLUMNS]
+
+# Serves bars from CSV fixtures (one <SYMBOL>.csv per symbol) so the app runs without network
+class OfflineProvider(MarketDataProvider):
+    def __init__(self, fixture_dir):
+        self.fixture_dir = fixture_dir
+
+    def fetch_bars(self, symbol, start, interval='1d'):
+        path = os.path.join(self.fixture_dir, f'{symbol}.csv')
+        if interval != '1d' or not os.path.exists(path):
+            return pd.DataFrame(columns=BAR_COLUMNS)
+        bars = pd.read_csv(path, parse_dates=['Date'])
+        return bars.loc[bars['Date'] >= pd.Timestamp(start), BAR_COLUMNS]
+
+# Local SQLite store of bars keyed by (symbol, interval, date). Only bars since the last
+# stored date are requested from the provider (the last bar is re-fetched so a partial
+# trading day gets refreshed), and a symbol is not re-fetched at all within
+# `refresh_seconds` of its previous successful fetch. History is re-downloaded only when a window
+# older than what is on disk is asked for.
+class MarketDataStore:
+    def __init__(self, path, provider, refresh_seconds=300):
+        self.path = path
+        self.provider = provider
+        self.refresh_seconds = refresh_seconds
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        with self._connect() as conn:
+            conn.execute('CREATE TABLE IF NOT EXISTS bars (symbol TEXT, interval TEXT, date TEXT, '
+                         'open REAL, high REAL, low REAL, close REAL, PRIMARY KEY (symbol, interval, date))')
+            conn.execute('CREATE TABLE IF NOT EXISTS fetches (symbol TEXT, interval TEXT, start TEXT, '
+                         'fetched_at REAL, PRIMARY KEY (symbol, interval))')
+
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=30)
+
+    # Fetches whatever is missing for `symbol` since `start` and writes it to the store
+    def update(self, symbol, start, interval='1d'):
+        start = pd.Timestamp(start).strftime('%Y-%m-%d')
+        with self._connect() as conn:
+            fetch = conn.execute('SELECT start, fetched_at FROM fetches WHERE symbol = ? AND interval = ?',
+                                 (symbol, interval)).fetchone()
+            last_date = conn.execute('SELECT MAX(date) FROM bars WHERE symbol = ? AND interval = ?',
+                                     (symbol, interval)).fetchone()[0]
+        covered = fetch is not None and fetch[0] <= start
+        if covered and time.time() - fetch[1] < self.refresh_seconds:
+            return
+        fetch_from = last_date[:10] if covered and last_date else start
+
+        bars = self.provider.fetch_bars(symbol, fetch_from, interval)
+        rows = [(symbol, interval, pd.Timestamp(row.Date).isoformat(), float(row.Open), float(row.High),
+                 float(row.Low), float(row.Close)) for row in bars.itertuples(index=False)]
+        # No bars means a failed download (yfinance returns an empty frame on network
+        # errors); recording the fetch would mark the window as covered until the next refresh
+        if not rows:
+            return
+        with self._connect() as conn:
+            conn.executemany('INSERT OR REPLACE INTO bars VALUES (?, ?, ?, ?, ?, ?, ?)', rows)
+            conn.execute('INSERT OR REPLACE INTO fetches VALUES (?, ?, ?, ?)',
+                         (symbol, interval, fetch[0] if covered else start, time.time()))
+
+    def load(self, symbol, start, interval='1d'):
+        with self._connect() as conn:
+            bars = pd.read_sql_query('SELECT date AS Date, open AS Open, high AS High, low AS Low, close AS Close '
+                                     'FROM bars WHERE symbol = ? AND interval = ? AND date >= ? ORDER BY date',
+                                     conn, params=(symbol, interval, pd.Timestamp(start).isoformat()))
+        bars['Date'] = pd.to_datetime(bars['Date'])
+        return bars
+
+    def get_history(self, symbol, start, interval='1d'):
+        self.update(symbol, start, interval)
+        return self.load(symbol, start, interval)
+
+    def latest_close(self, symbol, interval='1d'):
+        with self._connect() as conn:
+            row = conn.execute('SELECT close FROM bars WHERE symbol = ? AND interval = ? ORDER BY date DESC LIMIT 1',
+                               (symbol, interval)).fetchone()
+        return None if row is None else row[0]
+
+# Loads the whole symbol universe in the background and keeps it in memory. A bounded
+# thread pool fetches every symbol through the store (retrying failures, including empty
+# histories, with a linear backoff) and the pass repeats every `refresh_seconds`. One instance is shared by all
+# sessions, so switching symbols is served from memory once the first pass is done.
+class MarketDataWarmer:
+    def __init__(self, store, symbols, lookback_months=6, max_workers=4, retries=2, retry_delay=1.0, refresh_seconds=300):
+        self.store = store
+        self.symbols = list(symbols)
+        self.lookback_months = lookback_months
+        self.max_workers = max_workers
+        self.retries = retries
+        self.retry_delay = retry_delay
+        self.refresh_seconds = refresh_seconds
+        self.frames = {}
+        self.stats = {}
+        self.last_run = None
+        self.lock = threading.Lock()
+        self.thread = None
+
+    def _fetch(self, symbol):
+        start = pd.Timestamp.today().normalize() - pd.DateOffset(months=self.lookback_months)
+        started = time.perf_counter()
+        error = None
+        for attempt in range(1, self.retries + 2):
+            try:
+                frame = self.store.get_history(symbol, start)
+                # Providers such as yfinance swallow network errors and return no bars, so an
+                # empty history is a failed fetch too
+                if frame.empty:
+                    raise ValueError(f'no bars for {symbol} since {start:%Y-%m-%d}')
+                error = None
+                break
+            except Exception as exc:
+                error = exc
+                if attempt <= self.retries:
+                    time.sleep(self.retry_delay * attempt)
+        with self.lock:
+            if error is None:
+                self.frames[symbol] = frame
+            self.stats[symbol] = {'symbol': symbol, 'rows': len(self.frames.get(symbol, ())), 'attempts': attempt,
+                                  'seconds': time.perf_counter() - started,
+                                  'status': 'ok' if error is None else f'failed: {error}'}
+
+    # One warm-up pass over the whole universe
+    def refresh(self):
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            list(pool.map(self._fetch, self.symbols))
+        with self.lock:
+            self.last_run = {'finished': datetime.now(), 'seconds': time.perf_counter() - started}
+
+    def _run(self):
+        while True:
+            self.refresh()
+            time.sleep(self.refresh_seconds)
+
+    def start(self):
+        if self.thread is None:
+            self.thread = threading.Thread(target=self._run, name='market-data-warmer', daemon=True)
+            self.thread.start()
+        return self
+
+    def get(self, symbol):
+        with self.lock:
+            return self.frames.get(symbol)
+
+    def report(self):
+        with self.lock:
+            return self.last_run, pd.DataFrame([self.stats[symbol] for symbol in self.symbols if symbol in self.stats])
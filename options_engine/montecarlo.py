@@ -0,0 +1,175 @@
+# Monte Carlo P&L distributions of strategies under GBM
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from .strategies import evaluate_strategy
+
+# Terminal prices of `n_paths` GBM paths after T years. With `antithetic`, the second half
+# of the normals are the negated first half.
+def simulate_gbm_terminal(S0, T, mu, sigma, n_paths, rng, antithetic=False):
+    z = _standard_normals(rng, (n_paths,), antithetic)
+    return S0 * np.exp((mu - 0.5 * sigma**2) * T + sigma * np.sqrt(T) * z)
+
+# Whole GBM paths, shaped (n_paths, n_steps + 1) with S0 in the first column
+def simulate_gbm_paths(S0, T, mu, sigma, n_paths, n_steps, rng, antithetic=False):
+    dt = T / n_steps
+    z = _standard_normals(rng, (n_paths, n_steps), antithetic)
+    log_paths = np.cumsum((mu - 0.5 * sigma**2) * dt + sigma * np.sqrt(dt) * z, axis=1)
+    return S0 * np.exp(np.concatenate([np.zeros((n_paths, 1)), log_paths], axis=1))
+
+def _standard_normals(rng, shape, antithetic):
+    if not antithetic:
+        return rng.standard_normal(shape)
+    half = rng.standard_normal(((shape[0] + 1) // 2,) + shape[1:])
+    return np.concatenate([half, -half])[:shape[0]]
+
+# Streaming accumulator for simulated P&L. Mean/variance (and the covariance with a
+# control variate) are merged chunk by chunk with Chan's parallel update, and VaR/CVaR
+# are read from a fixed-edge histogram that also keeps the P&L sum of each bin (the
+# first and last bins catch everything outside the edges). Memory does not depend on
+# the number of paths, and accumulators from different workers merge with `merge`.
+class PnLAccumulator:
+    def __init__(self, low, high, n_bins=2000):
+        self.low, self.high, self.n_bins = low, high, n_bins
+        self.counts = np.zeros(n_bins + 2)
+        self.bin_sums = np.zeros(n_bins + 2)
+        self.samples = 0
+        self.wins = 0
+        # Moments over independent units (single paths, or antithetic pair averages)
+        self.n = 0
+        self.mean_y = self.mean_x = 0.0
+        self.m2_y = self.m2_x = self.c_xy = 0.0
+
+    def add_samples(self, pnl):
+        bins = np.clip(np.floor((pnl - self.low) / (self.high - self.low) * self.n_bins).astype(np.int64) + 1,
+                       0, self.n_bins + 1)
+        self.counts += np.bincount(bins, minlength=self.n_bins + 2)
+        self.bin_sums += np.bincount(bins, weights=pnl, minlength=self.n_bins + 2)
+        self.samples += len(pnl)
+        self.wins += int(np.count_nonzero(pnl > 0))
+
+    def add_moments(self, y, x):
+        n = len(y)
+        mean_y, mean_x = y.mean(), x.mean()
+        self._merge_moments(n, mean_y, mean_x, ((y - mean_y)**2).sum(), ((x - mean_x)**2).sum(),
+                            ((y - mean_y) * (x - mean_x)).sum())
+
+    def _merge_moments(self, n, mean_y, mean_x, m2_y, m2_x, c_xy):
+        total = self.n + n
+        if total == 0:
+            return
+        delta_y, delta_x = mean_y - self.mean_y, mean_x - self.mean_x
+        weight = self.n * n / total
+        self.m2_y += m2_y + delta_y**2 * weight
+        self.m2_x += m2_x + delta_x**2 * weight
+        self.c_xy += c_xy + delta_y * delta_x * weight
+        self.mean_y += delta_y * n / total
+        self.mean_x += delta_x * n / total
+        self.n = total
+
+    def merge(self, other):
+        self.counts += other.counts
+        self.bin_sums += other.bin_sums
+        self.samples += other.samples
+        self.wins += other.wins
+        self._merge_moments(other.n, other.mean_y, other.mean_x, other.m2_y, other.m2_x, other.c_xy)
+        return self
+
+    # VaR and CVaR at `level` (e.g. 0.95), both reported as positive losses
+    def var_cvar(self, level):
+        tail = (1 - level) * self.samples
+        cumulative = np.cumsum(self.counts)
+        i = int(np.searchsorted(cumulative, tail))
+        below = cumulative[i - 1] if i > 0 else 0.0
+        fraction = (tail - below) / self.counts[i] if self.counts[i] else 0.0
+        width = (self.high - self.low) / self.n_bins
+        if 0 < i <= self.n_bins:
+            quantile = self.low + (i - 1 + fraction) * width
+        else:
+            quantile = self.bin_sums[i] / self.counts[i] if self.counts[i] else self.low
+        tail_sum = self.bin_sums[:i].sum() + fraction * self.bin_sums[i]
+        return -quantile, -tail_sum / tail if tail > 0 else -quantile
+
+def _monte_carlo_chunk_worker(task):
+    (strategy, S0, horizon, remaining, r, mu, sigma, n_paths, chunk_size, seed, antithetic, n_steps,
+     control_variate, low, high) = task
+    rng = np.random.default_rng(seed)
+    accumulator = PnLAccumulator(low, high)
+    expected_price = S0 * np.exp(mu * horizon)
+    for start in range(0, n_paths, chunk_size):
+        size = min(chunk_size, n_paths - start)
+        if antithetic:
+            size += size % 2
+        if n_steps > 1:
+            prices = simulate_gbm_paths(S0, horizon, mu, sigma, size, n_steps, rng, antithetic)[:, -1]
+        else:
+            prices = simulate_gbm_terminal(S0, horizon, mu, sigma, size, rng, antithetic)
+        pnl = evaluate_strategy(strategy, prices, remaining, r, sigma)
+        accumulator.add_samples(pnl)
+        control = prices - expected_price if control_variate else np.zeros_like(prices)
+        if antithetic:
+            half = size // 2
+            accumulator.add_moments((pnl[:half] + pnl[half:]) / 2, (control[:half] + control[half:]) / 2)
+        else:
+            accumulator.add_moments(pnl, control)
+    return accumulator
+
+# Monte Carlo P&L distribution of a strategy under GBM. Paths are simulated to `horizon`
+# years (default: expiry) and the strategy is valued there with the remaining time to
+# expiry, in chunks of `chunk_size` paths so memory stays flat. `mu` is the drift
+# (default: r, i.e. risk-neutral). `antithetic` pairs each normal draw with its negation;
+# `control_variate` corrects the mean with the simulated price, whose expectation is known.
+# With n_workers > 1 the paths are split across a process pool; results are reproducible
+# for a given seed, chunk size and worker count.
+def monte_carlo_strategy(strategy, S0, T, r, sigma, n_paths=1_000_000, chunk_size=100_000, seed=0, mu=None,
+                         horizon=None, antithetic=False, control_variate=False, n_steps=1, n_workers=1, level=0.95):
+    mu = r if mu is None else mu
+    horizon = T if horizon is None else horizon
+    remaining = max(T - horizon, 0.0)
+    # Histogram edges cover the P&L over +/-8 standard deviations of the log price
+    z = np.linspace(-8, 8, 4001)
+    price_grid = S0 * np.exp((mu - 0.5 * sigma**2) * horizon + sigma * np.sqrt(horizon) * z)
+    grid_pnl = evaluate_strategy(strategy, price_grid, remaining, r, sigma)
+    low, high = grid_pnl.min(), grid_pnl.max()
+    padding = max(high - low, 1.0) * 0.01
+    low, high = low - padding, high + padding
+
+    n_workers = max(1, min(n_workers, n_paths // chunk_size or 1))
+    seeds = np.random.SeedSequence(seed).spawn(n_workers)
+    shares = [n_paths // n_workers + (i < n_paths % n_workers) for i in range(n_workers)]
+    tasks = [(strategy, S0, horizon, remaining, r, mu, sigma, share, chunk_size, child, antithetic, n_steps,
+              control_variate, low, high) for share, child in zip(shares, seeds)]
+    if n_workers == 1:
+        results = [_monte_carlo_chunk_worker(tasks[0])]
+    else:
+        # Workers start from a fresh interpreter (forkserver, or spawn where unavailable): the
+        # app calls this from Streamlit's multi-threaded server, and a forked child could
+        # inherit a lock some other thread was holding
+        method = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+        context = multiprocessing.get_context(method)
+        with ProcessPoolExecutor(max_workers=n_workers, mp_context=context) as pool:
+            results = list(pool.map(_monte_carlo_chunk_worker, tasks))
+    accumulator = results[0]
+    for other in results[1:]:
+        accumulator.merge(other)
+
+    expected_pnl = accumulator.mean_y
+    residual_m2 = accumulator.m2_y
+    if control_variate and accumulator.m2_x > 0:
+        beta = accumulator.c_xy / accumulator.m2_x
+        expected_pnl -= beta * accumulator.mean_x
+        residual_m2 -= beta * accumulator.c_xy
+    var, cvar = accumulator.var_cvar(level)
+    return {
+        'paths': accumulator.samples,
+        'expected_pnl': expected_pnl,
+        'std_error': np.sqrt(max(residual_m2, 0.0) / max(accumulator.n - 1, 1) / accumulator.n),
+        'probability_of_profit': accumulator.wins / accumulator.samples,
+        'var': var,
+        'cvar': cvar,
+        'level': level,
+        'edges': np.linspace(low, high, accumulator.n_bins + 1),
+        'counts': accumulator.counts,
+    }
@@ -0,0 +1,134 @@
+# Black-Scholes pricing, Greeks and implied volatility
+import numpy as np
+from scipy.special import ndtr
+
+from .lattice import lattice_columns
+
+# Shared Black-Scholes terms. S, K, T and sigma may be scalars or arrays of any
+# broadcastable shape. Returns d1, d2, N(d1), N(d2), K*exp(-rT) and sigma*sqrt(T); at
+# T = 0 (or sigma = 0) d1/d2 become +/-inf so prices collapse to (discounted) intrinsic value.
+def black_scholes_terms(S, K, T, r, sigma):
+    S, K, T, r, sigma = (np.asarray(x, dtype=float) for x in (S, K, T, r, sigma))
+    # Time/vol terms only depend on T, r and sigma, so they stay at their own (usually scalar) shape
+    T = np.maximum(T, 0.0)
+    vol_sqrt_T = sigma * np.sqrt(T)
+    discounted_strike = K * np.exp(-r * T)
+    live = vol_sqrt_T > 0
+    with np.errstate(divide='ignore', invalid='ignore'):
+        drift = np.log(S / K) + r * T
+        if np.all(live):
+            d1 = (drift + 0.5 * sigma**2 * T) / vol_sqrt_T
+            d2 = d1 - vol_sqrt_T
+        else:
+            d1 = np.where(live, (drift + 0.5 * sigma**2 * T) / np.where(live, vol_sqrt_T, 1.0),
+                          np.where(drift > 0, np.inf, -np.inf))
+            d2 = np.where(live, d1 - vol_sqrt_T, d1)
+    return d1, d2, ndtr(d1), ndtr(d2), discounted_strike, vol_sqrt_T
+
+# Vectorized Black-Scholes kernel: call prices, put prices, d1 and d2 in one pass. The
+# shared terms (discount factor, N(d1), N(d2)) are computed once for both calls and puts.
+def black_scholes_batch(S, K, T, r, sigma):
+    d1, d2, nd1, nd2, discounted_strike, _ = black_scholes_terms(S, K, T, r, sigma)
+    S = np.asarray(S, dtype=float)
+    call_price = S * nd1 - discounted_strike * nd2
+    put_price = discounted_strike * (1.0 - nd2) - S * (1.0 - nd1)
+    return call_price, put_price, d1, d2
+
+# Closed-form Black-Scholes Greeks from the same d1/d2 as the prices. Returns a dict of
+# (call, put) pairs for price, delta, gamma, vega (per 1.00 of vol), theta (per year)
+# and rho (per 1.00 of rate). Gamma, vega and the diffusion part of theta are 0 at expiry.
+def black_scholes_greeks(S, K, T, r, sigma):
+    d1, d2, nd1, nd2, discounted_strike, vol_sqrt_T = black_scholes_terms(S, K, T, r, sigma)
+    S, T, r, sigma = (np.asarray(x, dtype=float) for x in (S, T, r, sigma))
+    T = np.maximum(T, 0.0)
+    pdf_d1 = np.exp(-0.5 * d1**2) / np.sqrt(2 * np.pi)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        gamma = np.where(vol_sqrt_T > 0, pdf_d1 / (S * vol_sqrt_T), 0.0)
+        decay = np.where(vol_sqrt_T > 0, -S * pdf_d1 * sigma / (2 * np.sqrt(T)), 0.0)
+    vega = S * pdf_d1 * np.sqrt(T)
+    call_price = S * nd1 - discounted_strike * nd2
+    put_price = discounted_strike * (1.0 - nd2) - S * (1.0 - nd1)
+    return {
+        'price': (call_price, put_price),
+        'delta': (nd1, nd1 - 1.0),
+        'gamma': (gamma, gamma),
+        'vega': (vega, vega),
+        'theta': (decay - r * discounted_strike * nd2, decay + r * discounted_strike * (1.0 - nd2)),
+        'rho': (T * discounted_strike * nd2, -T * discounted_strike * (1.0 - nd2)),
+    }
+
+# Prices every strike in `strikes` against every point of `asset_prices` in one kernel call.
+# T may be an array broadcastable against asset_prices (e.g. a price x time grid); sigma is
+# either one vol or one vol per strike. `lattices` optionally gives each strike a Lattice
+# (None keeps Black-Scholes); those columns are priced on their lattice instead.
+# Returns (call_prices, put_prices), each shaped np.shape(asset_prices) + (len(strikes),).
+def price_legs(asset_prices, strikes, T, r, sigma, lattices=None):
+    call_prices, put_prices, _, _ = black_scholes_batch(np.asarray(asset_prices, dtype=float)[..., np.newaxis],
+                                                        np.asarray(strikes, dtype=float),
+                                                        np.asarray(T, dtype=float)[..., np.newaxis], r, sigma)
+    if lattices is not None and any(lattice is not None for lattice in lattices):
+        for columns, calls, puts in lattice_columns(asset_prices, strikes, T, r, sigma, lattices):
+            call_prices[..., columns], put_prices[..., columns] = calls, puts
+    return call_prices, put_prices
+
+# Black-Scholes formula for Call option
+def black_scholes_call(S, K, T, r, sigma):
+    call_price = black_scholes_batch(S, K, T, r, sigma)[0]
+    return call_price[()]
+def black_scholes_put(S, K, T, r, sigma):
+    # Black-Scholes formula for put option price
+    put_price = black_scholes_batch(S, K, T, r, sigma)[1]
+    return put_price[()]
+
+# Vectorized implied volatility: inverts the Black-Scholes price for whole arrays of
+# option prices, spots, strikes and expiries at once. Each entry starts from the
+# Corrado-Miller approximation and takes safeguarded Newton steps inside a shrinking
+# [low, high] bracket, falling back to bisection when a step leaves the bracket or vega
+# vanishes; converged entries are masked out of later iterations. `option_type` is
+# 'call'/'put' or an array of them. Returns (implied_vols, converged): entries outside the
+# no-arbitrage bounds or that fail to converge within max_iter are NaN / False.
+def implied_volatility(option_prices, S, K, T, r, option_type='call', tol=1e-8, max_iter=100, low=1e-6, high=5.0):
+    option_prices, S, K, T, r, is_call = np.broadcast_arrays(
+        *(np.asarray(x, dtype=float) for x in (option_prices, S, K, T, r)), np.asarray(option_type) == 'call')
+    shape = option_prices.shape
+    option_prices, S, K, T, r, is_call = (x.ravel() for x in (option_prices, S, K, T, r, is_call))
+    discounted_strike = K * np.exp(-r * np.maximum(T, 0.0))
+    # Work with call prices throughout; puts are converted with put-call parity
+    target = np.where(is_call, option_prices, option_prices + S - discounted_strike)
+    solvable = (T > 0) & (target > np.maximum(S - discounted_strike, 0.0)) & (target < S)
+
+    implied_vols = np.full(S.shape, np.nan)
+    converged = np.zeros(S.shape, dtype=bool)
+    lows = np.full(S.shape, low)
+    highs = np.full(S.shape, high)
+    intrinsic_gap = target - (S - discounted_strike) / 2
+    with np.errstate(invalid='ignore', divide='ignore'):
+        guess = (np.sqrt(2 * np.pi) / (S + discounted_strike) / np.sqrt(T)
+                 * (intrinsic_gap + np.sqrt(np.maximum(intrinsic_gap**2 - (S - discounted_strike)**2 / np.pi, 0.0))))
+    vols = np.clip(np.nan_to_num(guess, nan=0.3), low * 10, high / 2)
+
+    active = np.flatnonzero(solvable)
+    for _ in range(max_iter):
+        if active.size == 0:
+            break
+        sigma = vols[active]
+        greeks = black_scholes_greeks(S[active], K[active], T[active], r[active], sigma)
+        diff = greeks['price'][0] - target[active]
+        vega = greeks['vega'][0]
+        done = np.abs(diff) < tol
+        converged[active[done]] = True
+        implied_vols[active[done]] = sigma[done]
+
+        # Tighten the bracket: the call price increases with vol
+        too_high = diff > 0
+        highs[active[too_high]] = sigma[too_high]
+        lows[active[~too_high]] = sigma[~too_high]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            step = sigma - diff / vega
+        bracket_low, bracket_high = lows[active], highs[active]
+        inside = (vega > 1e-12) & (step > bracket_low) & (step < bracket_high)
+        vols[active] = np.where(inside, step, (bracket_low + bracket_high) / 2)
+
+        collapsed = bracket_high - bracket_low < tol
+        active = active[~done & ~collapsed]
+    return implied_vols.reshape(shape), converged.reshape(shape)
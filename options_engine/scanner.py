@@ -0,0 +1,150 @@
+# Strike scanner: enumerates every valid strike combination of a spread, butterfly or
+# condor over a strike ladder and ranks them at expiry under a lognormal price
+import heapq
+import itertools
+import math
+
+import numpy as np
+from scipy.special import ndtri
+
+from .pricing import black_scholes_batch
+
+# Scannable structures: number of ladder strikes picked, legs as (option_type, index of the
+# picked strike, signed quantity, builder strike parameter, builder premium parameter) and
+# an optional constraint on the picked strikes. Strikes are picked in increasing order.
+SCAN_STRUCTURES = {
+    "Bull Call Spread": (2, [('call', 0, 1, 'strike_price_long_call', 'premium_long_call'),
+                             ('call', 1, -1, 'strike_price_short_call', 'premium_short_call')], None),
+    "Bull Put Spread": (2, [('put', 0, 1, 'strike_price_long_put', 'premium_long_put'),
+                            ('put', 1, -1, 'strike_price_short_put', 'premium_short_put')], None),
+    "Long Call Butterfly Spread": (3, [('call', 0, 1, 'strike_price_low', 'premium_low'),
+                                       ('call', 1, -2, 'strike_price_mid', 'premium_mid'),
+                                       ('call', 2, 1, 'strike_price_high', 'premium_high')], 'symmetric'),
+    "Iron Butterfly": (3, [('put', 0, 1, 'strike_price_otm_put', 'premium_otm_put'),
+                           ('put', 1, -1, 'strike_price_atm', 'premium_atm'),
+                           ('call', 1, -1, 'strike_price_atm', 'premium_atm'),
+                           ('call', 2, 1, 'strike_price_otm_call', 'premium_otm_call')], None),
+    "Iron Condor": (4, [('put', 0, 1, 'strike_price_put_buy', 'premium_put_buy'),
+                        ('put', 1, -1, 'strike_price_put_sell', 'premium_put_sell'),
+                        ('call', 2, -1, 'strike_price_call_sell', 'premium_call_sell'),
+                        ('call', 3, 1, 'strike_price_call_buy', 'premium_call_buy')], None),
+}
+SCAN_SCORES = {'Expected P&L': 'expected_pnl', 'Probability of Profit': 'probability_of_profit',
+               'Reward / Risk': 'reward_risk', 'Expected Return on Risk': 'expected_return'}
+# Default limit on the combinations one scan may enumerate (roughly 13 us each), so a wide
+# ladder is refused up front instead of blocking for minutes
+MAX_SCAN_COMBINATIONS = 250_000
+
+# Number of strike combinations scan_strikes enumerates for `structure` on `n_strikes`
+# distinct strikes (the butterfly's symmetry constraint is applied after enumeration)
+def scan_size(structure, n_strikes):
+    return math.comb(n_strikes, SCAN_STRUCTURES[structure][0])
+
+# Scans every strike combination of `structure` on the ladder `strikes`. Premiums are
+# Black-Scholes prices at S0; the expiry distribution is lognormal with drift `mu`
+# (default r) and vol `sigma`. Each chunk of candidates is evaluated as one broadcasted
+# (price nodes x candidates) array, accumulated leg by leg: the nodes are equal-probability
+# quantiles of the expiry price (for the probability of profit) plus 0 and the ladder
+# strikes, where these payoffs, linear between strikes and flat beyond the outer ones,
+# reach their exact max profit and max loss. Expected P&L uses the closed-form expected
+# payoff of each leg. Candidates that cannot make money, miss `min_probability` or lose
+# more than `max_loss_limit` are pruned; the rest go through a bounded heap, and the
+# shortlist is cleared of candidates dominated on expected P&L, probability of profit and
+# max loss before the best `top_k` by `score` are returned.
+# Returns a dict with the ranked 'candidates' (list of dicts, each with the builder
+# 'params'), the number of combinations 'scanned' and how many were 'feasible'. Raises
+# ValueError when the ladder has more than `max_combinations` combinations (None for no limit).
+def scan_strikes(structure, strikes, S0, T, r, sigma, mu=None, score='expected_pnl', top_k=20, min_probability=0.0,
+                 max_loss_limit=None, n_quantiles=256, chunk_size=8192, max_combinations=MAX_SCAN_COMBINATIONS):
+    mu = r if mu is None else mu
+    strikes = np.unique(np.asarray(strikes, dtype=float))
+    n_picked, legs, constraint = SCAN_STRUCTURES[structure]
+    size = scan_size(structure, len(strikes))
+    if max_combinations is not None and size > max_combinations:
+        raise ValueError(f'{size:,} strike combinations exceed the limit of {max_combinations:,}; use fewer strikes')
+    call_premiums, put_premiums, _, _ = black_scholes_batch(S0, strikes, T, r, sigma)
+    # Expected payoff at expiry under drift mu: the Black-Scholes price at rate mu, undiscounted
+    expected_calls, expected_puts, _, _ = black_scholes_batch(S0, strikes, T, mu, sigma)
+    growth = np.exp(mu * T)
+    expected_calls, expected_puts = expected_calls * growth, expected_puts * growth
+
+    z = ndtri((np.arange(n_quantiles) + 0.5) / n_quantiles)
+    quantiles = S0 * np.exp((mu - 0.5 * sigma**2) * T + sigma * np.sqrt(T) * z)
+    nodes = np.concatenate([quantiles, [0.0], strikes])
+    call_payoffs = np.maximum(nodes[:, np.newaxis] - strikes, 0.0)
+    put_payoffs = np.maximum(strikes - nodes[:, np.newaxis], 0.0)
+
+    capacity = 4 * top_k
+    heap = []
+    scanned = feasible = 0
+    combinations = itertools.combinations(range(len(strikes)), n_picked)
+    while True:
+        picked = np.fromiter(itertools.chain.from_iterable(itertools.islice(combinations, chunk_size)), dtype=np.int64)
+        if picked.size == 0:
+            break
+        picked = picked.reshape(-1, n_picked)
+        if constraint == 'symmetric':
+            picked = picked[np.isclose(strikes[picked[:, 1]] - strikes[picked[:, 0]], strikes[picked[:, 2]] - strikes[picked[:, 1]])]
+        scanned += len(picked)
+
+        pnl = np.zeros((len(nodes), len(picked)))
+        premium_paid = np.zeros(len(picked))
+        expected_payoff = np.zeros(len(picked))
+        for option_type, position, quantity, _, _ in legs:
+            columns = picked[:, position]
+            is_call = option_type == 'call'
+            pnl += quantity * (call_payoffs if is_call else put_payoffs)[:, columns]
+            premium_paid += quantity * (call_premiums if is_call else put_premiums)[columns]
+            expected_payoff += quantity * (expected_calls if is_call else expected_puts)[columns]
+        pnl -= premium_paid
+        metrics = {
+            'expected_pnl': expected_payoff - premium_paid,
+            'probability_of_profit': np.mean(pnl[:n_quantiles] > 0, axis=0),
+            'max_profit': pnl[n_quantiles:].max(axis=0),
+            'max_loss': np.maximum(-pnl[n_quantiles:].min(axis=0), 0.0),
+        }
+        with np.errstate(divide='ignore', invalid='ignore'):
+            metrics['reward_risk'] = np.where(metrics['max_loss'] > 0, metrics['max_profit'] / metrics['max_loss'], np.inf)
+            metrics['expected_return'] = np.where(metrics['max_loss'] > 0, metrics['expected_pnl'] / metrics['max_loss'], np.inf)
+
+        keep = (metrics['max_profit'] > 0) & (metrics['probability_of_profit'] >= min_probability)
+        if max_loss_limit is not None:
+            keep &= metrics['max_loss'] <= max_loss_limit
+        keep = np.flatnonzero(keep)
+        feasible += keep.size
+        # Only the chunk's own best `capacity` candidates can enter the heap
+        if keep.size > capacity:
+            keep = keep[np.argpartition(-metrics[score][keep], capacity - 1)[:capacity]]
+        for i in keep:
+            entry = (float(metrics[score][i]), scanned - len(picked) + int(i),
+                     picked[i], premium_paid[i], {name: float(values[i]) for name, values in metrics.items()})
+            if len(heap) < capacity:
+                heapq.heappush(heap, entry)
+            elif entry[:2] > heap[0][:2]:
+                heapq.heapreplace(heap, entry)
+
+    shortlist = sorted(heap, reverse=True)
+    shortlist = [entry for entry in shortlist if not any(dominates(other[4], entry[4]) for other in shortlist)]
+    candidates = [scan_candidate(strikes, legs, picked, premium_paid, metrics, call_premiums, put_premiums)
+                  for _, _, picked, premium_paid, metrics in shortlist[:top_k]]
+    return {'candidates': candidates, 'scanned': scanned, 'feasible': feasible}
+
+# a is at least as good as b on expected P&L, probability of profit and max loss, and better on one
+def dominates(a, b):
+    at_least = (a['expected_pnl'] >= b['expected_pnl'] and a['probability_of_profit'] >= b['probability_of_profit']
+                and a['max_loss'] <= b['max_loss'])
+    better = (a['expected_pnl'] > b['expected_pnl'] or a['probability_of_profit'] > b['probability_of_profit']
+              or a['max_loss'] < b['max_loss'])
+    return at_least and better
+
+# One ranked candidate with the builder parameters that reproduce it. Legs sharing a
+# premium parameter (the iron butterfly's ATM put and call) get their average premium.
+def scan_candidate(strikes, legs, picked, premium_paid, metrics, call_premiums, put_premiums):
+    params = {}
+    premiums = {}
+    for option_type, position, _, strike_param, premium_param in legs:
+        params[strike_param] = float(strikes[picked[position]])
+        premium = (call_premiums if option_type == 'call' else put_premiums)[picked[position]]
+        premiums.setdefault(premium_param, []).append(float(premium))
+    params.update({name: float(np.mean(values)) for name, values in premiums.items()})
+    return {'strikes': tuple(float(strikes[i]) for i in picked), 'net_premium': float(premium_paid), **metrics, 'params': params}
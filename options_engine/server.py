@@ -0,0 +1,77 @@
+# Local HTTP endpoint for the batch evaluation, standard library only:
+#   GET  /health      {"status": "ok"}
+#   GET  /strategies  the built-in strategies and their inputs
+#   POST /evaluate    body: one config, a JSON list of configs or JSON lines; the response
+#                     is one JSON result per line, written as each chunk is evaluated.
+#                     ?grid=1 adds the payoff grid to every result.
+import json
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+from .batch import chunked, evaluate_stream, strategy_inputs
+
+class EvaluationHandler(BaseHTTPRequestHandler):
+    chunk_size = 1000
+
+    def do_GET(self):
+        path = urlparse(self.path).path
+        if path == '/health':
+            self._send_json(200, {'status': 'ok'})
+        elif path == '/strategies':
+            self._send_json(200, strategy_inputs())
+        else:
+            self._send_json(404, {'error': f'Unknown path {path}'})
+
+    def do_POST(self):
+        url = urlparse(self.path)
+        if url.path != '/evaluate':
+            self._send_json(404, {'error': f'Unknown path {url.path}'})
+            return
+        body = self.rfile.read(int(self.headers.get('Content-Length', 0))).decode()
+        try:
+            configs = parse_configs(body)
+        except ValueError as exc:
+            self._send_json(400, {'error': f'Invalid request body: {exc}'})
+            return
+        include_grid = parse_qs(url.query).get('grid', ['0'])[0] not in ('0', 'false', '')
+        # No Content-Length: the response is streamed and ends when the connection closes
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/x-ndjson')
+        self.end_headers()
+        for records in evaluate_stream(chunked(configs, self.chunk_size), include_grid=include_grid):
+            self.wfile.write(''.join(json.dumps(record) + '\n' for record in records).encode())
+            self.wfile.flush()
+
+    def _send_json(self, status, payload):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+# A single config, a JSON list of configs or one config per line
+def parse_configs(body):
+    try:
+        configs = json.loads(body)
+    except json.JSONDecodeError:
+        return [json.loads(line) for line in body.splitlines() if line.strip()]
+    if isinstance(configs, dict):
+        return [configs]
+    if not isinstance(configs, list):
+        raise ValueError('expected a config object, a list of configs or JSON lines')
+    return configs
+
+def make_server(host='127.0.0.1', port=8765, chunk_size=1000):
+    handler = type('Handler', (EvaluationHandler,), {'chunk_size': chunk_size})
+    return ThreadingHTTPServer((host, port), handler)
+
+def serve(host='127.0.0.1', port=8765, chunk_size=1000):
+    server = make_server(host, port, chunk_size)
+    print(f'Serving strategy evaluation on http://{host}:{server.server_address[1]}/evaluate')
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
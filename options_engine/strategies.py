@@ -0,0 +1,312 @@
+# Option strategies as legs, their batched evaluation and the built-in strategy builders
+import dataclasses
+import functools
+import inspect
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+from .lattice import Lattice, lattice_columns
+from .pricing import black_scholes_greeks, implied_volatility, price_legs
+
+# Solves the implied volatility of every leg from its premium at spot S and returns the
+# strategy with those vols attached to the legs, plus a table of the per-leg results.
+# Legs whose IV cannot be solved keep the strategy-wide sigma.
+def strategy_implied_volatilities(strategy, S, T, r):
+    if not strategy.legs:
+        return strategy, pd.DataFrame()
+    implied_vols, converged = implied_volatility([leg.premium for leg in strategy.legs], S,
+                                                 [leg.strike for leg in strategy.legs], T, r,
+                                                 [leg.option_type for leg in strategy.legs])
+    legs = tuple(dataclasses.replace(leg, sigma=float(iv)) if ok else leg
+                 for leg, iv, ok in zip(strategy.legs, implied_vols, converged))
+    report = pd.DataFrame({'Leg': [f'{leg.position} {leg.option_type} {leg.strike:g}' for leg in strategy.legs],
+                           'Premium': [leg.premium for leg in strategy.legs],
+                           'Implied Vol': implied_vols, 'Converged': converged})
+    return dataclasses.replace(strategy, legs=legs), report
+
+# A single option leg of a strategy. `premium` is the price paid for a long leg or
+# received for a short leg, per unit of `quantity`.
+@dataclass(frozen=True)
+class Leg:
+    option_type: str  # 'call' or 'put'
+    strike: float
+    premium: float = 0.0
+    quantity: float = 1
+    position: str = 'long'  # 'long' or 'short'
+    sigma: float = None  # leg-specific (e.g. implied) volatility; None uses the strategy-wide sigma
+    lattice: Lattice = None  # binomial/trinomial lattice (e.g. American exercise); None prices with Black-Scholes
+
+    # Pricing treats anything but 'call' as a put and anything but 'long' as short, so a
+    # misspelt leg (e.g. 'Call' from a config file) must not get that far
+    def __post_init__(self):
+        if self.option_type not in ('call', 'put'):
+            raise ValueError(f"Unknown option type {self.option_type!r}; expected 'call' or 'put'")
+        if self.position not in ('long', 'short'):
+            raise ValueError(f"Unknown position {self.position!r}; expected 'long' or 'short'")
+
+    @property
+    def weight(self):
+        return self.quantity if self.position == 'long' else -self.quantity
+
+# A strategy is a list of option legs plus an optional stock position of
+# `stock_quantity` shares bought at `stock_price`.
+@dataclass(frozen=True)
+class Strategy:
+    name: str
+    legs: tuple
+    stock_quantity: float = 0
+    stock_price: float = 0.0
+
+# Collects the legs of several strategies into unique (strike, volatility, lattice) columns,
+# where legs without their own sigma use the strategy-wide `sigma`. Returns the column
+# strikes, vols and lattices, (columns x strategies) call/put weight matrices, per-strategy
+# stock quantities and the constant part of each payoff (premiums and stock cost).
+def strategy_weights(strategies, sigma):
+    strike_columns = {}
+    for strategy in strategies:
+        for leg in strategy.legs:
+            strike_columns.setdefault(leg_column(leg, sigma), len(strike_columns))
+
+    call_weights = np.zeros((len(strike_columns), len(strategies)))
+    put_weights = np.zeros((len(strike_columns), len(strategies)))
+    stock_weights = np.zeros(len(strategies))
+    constants = np.zeros(len(strategies))
+    for j, strategy in enumerate(strategies):
+        for leg in strategy.legs:
+            weights = call_weights if leg.option_type == 'call' else put_weights
+            weights[strike_columns[leg_column(leg, sigma)], j] += leg.weight
+            constants[j] -= leg.weight * leg.premium
+        stock_weights[j] = strategy.stock_quantity
+        constants[j] -= strategy.stock_quantity * strategy.stock_price
+    strikes = np.array([strike for strike, _, _ in strike_columns], dtype=float)
+    vols = np.array([vol for _, vol, _ in strike_columns], dtype=float)
+    lattices = [lattice for _, _, lattice in strike_columns]
+    return strikes, vols, lattices, call_weights, put_weights, stock_weights, constants
+
+def leg_column(leg, sigma):
+    return float(leg.strike), float(sigma if leg.sigma is None else leg.sigma), leg.lattice
+
+# Evaluates several strategies on the same price grid in one batched pass. Legs are
+# deduplicated across all strategies by strike and vol (the kernel prices a call and a put
+# per column together), so the cost scales with the number of unique columns rather than
+# strategies x legs. Each strategy is then a weighted sum of the priced columns.
+# T may be an array broadcastable against asset_prices (e.g. a price x time grid).
+# Returns an array shaped (len(strategies),) + the broadcast shape of asset_prices and T.
+def evaluate_strategies(strategies, asset_prices, T, r, sigma):
+    asset_prices = np.asarray(asset_prices, dtype=float)
+    strikes, vols, lattices, call_weights, put_weights, stock_weights, constants = strategy_weights(strategies, sigma)
+    payoffs = constants + asset_prices[..., np.newaxis] * stock_weights
+    if len(strikes):
+        call_prices, put_prices = price_legs(asset_prices, strikes, T, r, vols, lattices)
+        payoffs = payoffs + call_prices @ call_weights + put_prices @ put_weights
+    return np.moveaxis(payoffs, -1, 0)
+
+def evaluate_strategy(strategy, asset_prices, T, r, sigma):
+    return evaluate_strategies([strategy], asset_prices, T, r, sigma)[0]
+
+# Strategy value and Greeks on a grid in one broadcasted pass, e.g. asset_prices shaped
+# (n, 1) against T shaped (1, m) for a price x time-to-expiry surface. Returns a dict with
+# 'value' (P&L) and the closed-form 'delta', 'gamma', 'vega', 'theta' and 'rho'; legs with a
+# lattice take their Greeks from lattice_greeks.
+def evaluate_strategy_greeks(strategy, asset_prices, T, r, sigma):
+    asset_prices = np.asarray(asset_prices, dtype=float)
+    strikes, vols, lattices, call_weights, put_weights, stock_weights, constants = strategy_weights([strategy], sigma)
+    shape = np.broadcast_shapes(asset_prices.shape, np.shape(T))
+    result = {name: np.zeros(shape) for name in ('price', 'delta', 'gamma', 'vega', 'theta', 'rho')}
+    if len(strikes):
+        greeks = black_scholes_greeks(asset_prices[..., np.newaxis], strikes, np.asarray(T, dtype=float)[..., np.newaxis], r, vols)
+        if any(lattice is not None for lattice in lattices):
+            greeks = {name: tuple(np.array(np.broadcast_to(values, shape + strikes.shape)) for values in pair)
+                      for name, pair in greeks.items()}
+            for columns, calls, puts in lattice_columns(asset_prices, strikes, T, r, vols, lattices, greeks=True):
+                for name, (call_values, put_values) in greeks.items():
+                    call_values[..., columns], put_values[..., columns] = calls[name], puts[name]
+        for name, (calls, puts) in greeks.items():
+            result[name] = result[name] + calls @ call_weights[:, 0] + puts @ put_weights[:, 0]
+    result['value'] = result.pop('price') + constants[0] + stock_weights[0] * asset_prices
+    result['delta'] = result['delta'] + stock_weights[0]
+    return result
+
+# Strategy builders: each returns the legs of one of the built-in strategies
+def call_strategy(strike_price, premium):
+    return Strategy('Call', (Leg('call', strike_price, premium),))
+
+def put_strategy(strike_price, premium):
+    return Strategy('Put', (Leg('put', strike_price, premium),))
+
+def straddle_strategy(strike_price, premium_call, premium_put):
+    return Strategy('Straddle', (Leg('call', strike_price, premium_call), Leg('put', strike_price, premium_put)))
+
+def covered_call_strategy(purchase_price, strike_price, premium):
+    return Strategy('Covered Call', (Leg('call', strike_price, premium, position='short'),),
+                    stock_quantity=1, stock_price=purchase_price)
+
+def married_put_strategy(purchase_price, strike_price, premium_paid):
+    return Strategy('Married Put', (Leg('put', strike_price, premium_paid),),
+                    stock_quantity=1, stock_price=purchase_price)
+
+def bull_call_spread_strategy(strike_price_long_call, strike_price_short_call, premium_long_call, premium_short_call):
+    return Strategy('Bull Call Spread', (Leg('call', strike_price_long_call, premium_long_call),
+                                         Leg('call', strike_price_short_call, premium_short_call, position='short')))
+
+def bull_put_spread_strategy(strike_price_short_put, strike_price_long_put, premium_short_put, premium_long_put):
+    return Strategy('Bull Put Spread', (Leg('put', strike_price_short_put, premium_short_put, position='short'),
+                                        Leg('put', strike_price_long_put, premium_long_put)))
+
+def protective_collar_strategy(purchase_price, strike_price_put, premium_put, strike_price_call, premium_call):
+    return Strategy('Protective Collar', (Leg('put', strike_price_put, premium_put),
+                                          Leg('call', strike_price_call, premium_call, position='short')),
+                    stock_quantity=1, stock_price=purchase_price)
+
+def long_call_butterfly_strategy(strike_price_low, strike_price_mid, strike_price_high, premium_low, premium_mid, premium_high):
+    return Strategy('Long Call Butterfly Spread', (Leg('call', strike_price_low, premium_low),
+                                                   Leg('call', strike_price_mid, premium_mid, quantity=2, position='short'),
+                                                   Leg('call', strike_price_high, premium_high)))
+
+def iron_butterfly_strategy(strike_price_atm, strike_price_otm_put, strike_price_otm_call, premium_atm, premium_otm_put, premium_otm_call):
+    return Strategy('Iron Butterfly', (Leg('put', strike_price_otm_put, premium_otm_put),
+                                       Leg('put', strike_price_atm, premium_atm, position='short'),
+                                       Leg('call', strike_price_atm, premium_atm, position='short'),
+                                       Leg('call', strike_price_otm_call, premium_otm_call)))
+
+def iron_condor_strategy(strike_price_put_buy, strike_price_put_sell, strike_price_call_buy, strike_price_call_sell, premium_put_buy, premium_put_sell, premium_call_buy, premium_call_sell):
+    return Strategy('Iron Condor', (Leg('put', strike_price_put_buy, premium_put_buy),
+                                    Leg('put', strike_price_put_sell, premium_put_sell, position='short'),
+                                    Leg('call', strike_price_call_sell, premium_call_sell, position='short'),
+                                    Leg('call', strike_price_call_buy, premium_call_buy)))
+
+def calculate_call_payoff(asset_prices, strike_price, T, r, sigma, premium):
+    return evaluate_strategy(call_strategy(strike_price, premium), asset_prices, T, r, sigma)
+
+def calculate_put_payoff(asset_prices, strike_price, T, r, sigma, premium):
+    return evaluate_strategy(put_strategy(strike_price, premium), asset_prices, T, r, sigma)
+
+# Function to calculate the payoff for a straddle option
+def calculate_straddle_payoff(asset_prices, strike_price, T, r, sigma, premium_call, premium_put):
+    return evaluate_strategy(straddle_strategy(strike_price, premium_call, premium_put), asset_prices, T, r, sigma)
+
+def calculate_covered_call_payoff_bs(asset_prices, purchase_price, strike_price, T, r, sigma, premium):
+    return evaluate_strategy(covered_call_strategy(purchase_price, strike_price, premium), asset_prices, T, r, sigma)
+
+def calculate_married_put_payoff_bs(asset_prices, purchase_price, strike_price, T, r, sigma, premium_paid):
+    return evaluate_strategy(married_put_strategy(purchase_price, strike_price, premium_paid), asset_prices, T, r, sigma)
+
+def calculate_bull_call_spread_payoff_bs(asset_prices, strike_price_long_call, strike_price_short_call, T, r, sigma, premium_long_call, premium_short_call):
+    strategy = bull_call_spread_strategy(strike_price_long_call, strike_price_short_call, premium_long_call, premium_short_call)
+    return evaluate_strategy(strategy, asset_prices, T, r, sigma)
+
+# Function to calculate the payoff for a Bull Put Spread option
+def calculate_bull_put_spread_payoff_bs(asset_prices, strike_price_short_put, strike_price_long_put, T, r, sigma, premium_short_put, premium_long_put):
+    strategy = bull_put_spread_strategy(strike_price_short_put, strike_price_long_put, premium_short_put, premium_long_put)
+    return evaluate_strategy(strategy, asset_prices, T, r, sigma)
+
+# Function to calculate the payoff for a Protective Collar option
+# The premiums passed in are replaced by Black-Scholes prices at the purchase price and the
+# collar is valued at expiry (intrinsic value of both options).
+def calculate_protective_collar_payoff_bs(asset_prices, purchase_price, strike_price_put, premium_put, strike_price_call, premium_call, T, r, sigma):
+    call_premiums, put_premiums = price_legs(purchase_price, [strike_price_put, strike_price_call], T, r, sigma)
+    strategy = protective_collar_strategy(purchase_price, strike_price_put, put_premiums[0], strike_price_call, call_premiums[1])
+    return evaluate_strategy(strategy, asset_prices, 0, r, sigma)
+
+# Function to calculate the payoff for a Long Call Butterfly Spread option
+def calculate_long_call_butterfly_payoff_bs(asset_prices, strike_price_low, strike_price_mid, strike_price_high, T, r, sigma, premium_low, premium_mid, premium_high):
+    strategy = long_call_butterfly_strategy(strike_price_low, strike_price_mid, strike_price_high, premium_low, premium_mid, premium_high)
+    return evaluate_strategy(strategy, asset_prices, T, r, sigma)
+
+# Function to calculate the payoff for an Iron Butterfly option
+def calculate_iron_butterfly_payoff_bs(asset_prices, strike_price_atm, strike_price_otm_put, strike_price_otm_call, T, r, sigma, premium_atm, premium_otm_put, premium_otm_call):
+    strategy = iron_butterfly_strategy(strike_price_atm, strike_price_otm_put, strike_price_otm_call, premium_atm, premium_otm_put, premium_otm_call)
+    return evaluate_strategy(strategy, asset_prices, T, r, sigma)
+
+# Function to calculate the payoff for an Iron Condor option
+def calculate_iron_condor_payoff_bs(asset_prices, strike_price_put_buy, strike_price_put_sell, strike_price_call_buy, strike_price_call_sell, T, r, sigma, premium_put_buy, premium_put_sell, premium_call_buy, premium_call_sell):
+    strategy = iron_condor_strategy(strike_price_put_buy, strike_price_put_sell, strike_price_call_buy, strike_price_call_sell,
+                                    premium_put_buy, premium_put_sell, premium_call_buy, premium_call_sell)
+    return evaluate_strategy(strategy, asset_prices, T, r, sigma)
+
+# Built-in strategies: plot label, builder and the extra inputs the builder needs.
+# Each input is (parameter, label, default, min_value); defaults are functions of the
+# common strike price and asset price. Builder arguments not listed here come from the
+# common inputs (strike_price, premium).
+STRATEGIES = {
+    "Call": ('Long Call Payoff', call_strategy, []),
+    "Put": ('Long Put Payoff', put_strategy, []),
+    "Straddle": ('Straddle Payoff', straddle_strategy, [
+        ('strike_price', 'Strike Price for Both Call and Put', lambda K, S: K, 0),
+        ('premium_call', 'Premium Paid for Call Option', lambda K, S: 5.0, 0.0),
+        ('premium_put', 'Premium Paid for Put Option', lambda K, S: 5.0, 0.0)]),
+    "Covered Call": ('Covered Call Payoff', covered_call_strategy, [
+        ('purchase_price', 'Purchase Price of Underlying Asset', lambda K, S: S, None)]),
+    "Married Put": ('Married Put Payoff', married_put_strategy, [
+        ('purchase_price', 'Purchase Price of Underlying Asset', lambda K, S: S, None),
+        ('premium_paid', 'Premium Paid for Put Option', lambda K, S: 10.0, None)]),
+    "Bull Call Spread": ('Bull Call Spread Payoff', bull_call_spread_strategy, [
+        ('strike_price_long_call', 'Strike Price for Long Call', lambda K, S: K, 0),
+        ('premium_long_call', 'Premium for Long Call', lambda K, S: 10.0, 0.0),
+        ('strike_price_short_call', 'Strike Price for Short Call', lambda K, S: K + 10, 0),
+        ('premium_short_call', 'Premium for Short Call', lambda K, S: 5.0, 0.0)]),
+    "Bull Put Spread": ('Bull Put Spread Payoff', bull_put_spread_strategy, [
+        ('strike_price_short_put', 'Strike Price for Short Put', lambda K, S: K, 0),
+        ('premium_short_put', 'Premium for Short Put', lambda K, S: 10.0, 0.0),
+        ('strike_price_long_put', 'Strike Price for Long Put', lambda K, S: K - 10, 0),
+        ('premium_long_put', 'Premium for Long Put', lambda K, S: 5.0, 0.0)]),
+    "Protective Collar": ('Protective Collar Payoff', protective_collar_strategy, [
+        ('purchase_price', 'Purchase Price of Underlying Asset', lambda K, S: S, None),
+        ('strike_price_put', 'Strike Price for Long Put', lambda K, S: K - 5, 0),
+        ('premium_put', 'Premium for Long Put', lambda K, S: 5.0, 0.0),
+        ('strike_price_call', 'Strike Price for Short Call', lambda K, S: K + 10, 0),
+        ('premium_call', 'Premium for Short Call', lambda K, S: 5.0, 0.0)]),
+    "Long Call Butterfly Spread": ('Long Call Butterfly Spread Payoff', long_call_butterfly_strategy, [
+        ('strike_price_low', 'Strike Price for Low Call', lambda K, S: K - 10, 0),
+        ('premium_low', 'Premium for Low Call', lambda K, S: 3.0, 0.0),
+        ('strike_price_mid', 'Strike Price for Mid Call', lambda K, S: K, 0),
+        ('premium_mid', 'Premium for Mid Call', lambda K, S: 4.0, 0.0),
+        ('strike_price_high', 'Strike Price for High Call', lambda K, S: K + 10, 0),
+        ('premium_high', 'Premium for High Call', lambda K, S: 8.0, 0.0)]),
+    "Iron Butterfly": ('Iron Butterfly Payoff', iron_butterfly_strategy, [
+        ('strike_price_atm', 'Strike Price for ATM Options', lambda K, S: K, 0),
+        ('premium_atm', 'Premium for ATM Options', lambda K, S: 10.0, 0.0),
+        ('strike_price_otm_put', 'Strike Price for OTM Put', lambda K, S: K - 10, 0),
+        ('premium_otm_put', 'Premium for OTM Put', lambda K, S: 10.0, 0.0),
+        ('strike_price_otm_call', 'Strike Price for OTM Call', lambda K, S: K + 10, 0),
+        ('premium_otm_call', 'Premium for OTM Call', lambda K, S: 3.0, 0.0)]),
+    "Iron Condor": ('Iron Condor Payoff', iron_condor_strategy, [
+        ('strike_price_put_buy', 'Strike Price for Buy Put', lambda K, S: K - 20, 0),
+        ('premium_put_buy', 'Premium for Buy Put', lambda K, S: 1.0, 0.0),
+        ('strike_price_put_sell', 'Strike Price for Sell Put', lambda K, S: K - 10, 0),
+        ('premium_put_sell', 'Premium for Sell Put', lambda K, S: 2.0, 0.0),
+        ('strike_price_call_sell', 'Strike Price for Sell Call', lambda K, S: K + 10, 0),
+        ('premium_call_sell', 'Premium for Sell Call', lambda K, S: 2.0, 0.0),
+        ('strike_price_call_buy', 'Strike Price for Buy Call', lambda K, S: K + 20, 0),
+        ('premium_call_buy', 'Premium for Buy Call', lambda K, S: 1.0, 0.0)]),
+}
+
+# The strategy with `lattice` attached to the legs at the indices in `legs` (default: all
+# legs), e.g. to price some of them as American options
+def with_lattice(strategy, lattice, legs=None):
+    legs = range(len(strategy.legs)) if legs is None else set(legs)
+    return dataclasses.replace(strategy, legs=tuple(dataclasses.replace(leg, lattice=lattice) if i in legs else leg
+                                                    for i, leg in enumerate(strategy.legs)))
+
+# Builds one of the built-in strategies from a dict of input values
+def build_strategy(strategy, params):
+    _, builder, _ = STRATEGIES[strategy]
+    return builder(**{name: params[name] for name in builder_arguments(builder)})
+
+# Builder parameter names, looked up once per builder (batch jobs build thousands of strategies)
+@functools.lru_cache(maxsize=None)
+def builder_arguments(builder):
+    return tuple(inspect.signature(builder).parameters)
+
+# Fields a row of the legs table needs to become a leg
+LEG_FIELDS = ('option_type', 'strike', 'premium', 'quantity', 'position')
+
+# Builds a user-defined strategy from rows of leg fields (as edited in the legs table).
+# Rows with a missing field (None, or NaN as the data editor leaves half-filled rows) are skipped.
+def custom_strategy(rows, stock_quantity=0, stock_price=0.0):
+    legs = tuple(Leg(row['option_type'], float(row['strike']), float(row['premium']),
+                     float(row['quantity']), row['position'])
+                 for row in rows if all(pd.notna(row.get(field)) and row.get(field) != '' for field in LEG_FIELDS))
+    return Strategy('Custom', legs, stock_quantity=stock_quantity, stock_price=stock_price)
@@ -0,0 +1,50 @@
+# Per-stage wall-clock timing records
+import json
+import logging
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from datetime import datetime
+
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+# Per-stage wall-clock timings (fetch, pricing, payoff, render, ...). Each record is a
+# flat dict so the history can be exported as JSON lines and is also sent to the
+# module logger. Disabled timers only run the timed block.
+class StageTimer:
+    def __init__(self, enabled=False, max_records=2000):
+        self.enabled = enabled
+        self.records = deque(maxlen=max_records)
+        self.run = 0
+        self.lock = threading.Lock()
+
+    def start_run(self):
+        with self.lock:
+            self.run += 1
+
+    @contextmanager
+    def stage(self, name, **fields):
+        if not self.enabled:
+            yield
+            return
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            record = {'run': self.run, 'stage': name, 'seconds': time.perf_counter() - started,
+                      'timestamp': datetime.now().isoformat(timespec='milliseconds'), **fields}
+            with self.lock:
+                self.records.append(record)
+            logger.info(json.dumps(record, default=str))
+
+    def last_run(self):
+        with self.lock:
+            records = [record for record in self.records if record['run'] == self.run]
+        return pd.DataFrame(records, columns=['stage', 'seconds'])
+
+    def to_json_lines(self):
+        with self.lock:
+            return ''.join(json.dumps(record, default=str) + '\n' for record in self.records)
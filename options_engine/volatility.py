@@ -0,0 +1,92 @@
+# Rolling historical-volatility estimators over OHLC bars
+import numpy as np
+import pandas as pd
+
+# Rolling sums along the first (time) axis from one cumulative sum, so the cost is O(n)
+# whatever the window. Works column-wise on (time x symbols) arrays; a window containing
+# a NaN (e.g. a symbol with a shorter history) is NaN, as are the first window - 1 rows.
+def rolling_sum(values, window):
+    values = np.asarray(values, dtype=float)
+    missing = np.isnan(values)
+    padding = np.zeros((1,) + values.shape[1:])
+    sums = np.concatenate([padding, np.cumsum(np.where(missing, 0.0, values), axis=0)])
+    gaps = np.concatenate([padding, np.cumsum(missing, axis=0)])
+    result = np.full(values.shape, np.nan)
+    if len(values) >= window:
+        window_sums = sums[window:] - sums[:-window]
+        result[window - 1:] = np.where(gaps[window:] - gaps[:-window] > 0, np.nan, window_sums)
+    return result
+
+def rolling_mean(values, window):
+    return rolling_sum(values, window) / window
+
+# Rolling sample variance from rolling sums of x and x^2
+def rolling_variance(values, window):
+    values = np.asarray(values, dtype=float)
+    sums = rolling_sum(values, window)
+    return np.maximum(rolling_sum(values**2, window) - sums**2 / window, 0.0) / (window - 1)
+
+# Per-bar variance estimators. Each takes (open, high, low, close) arrays shaped
+# (time x symbols) and returns the rolling variance per bar over `window` bars.
+def close_to_close_variance(open_, high, low, close, window):
+    returns = np.log(close[1:] / close[:-1])
+    return _lagged(rolling_variance(returns, window))
+
+def parkinson_variance(open_, high, low, close, window):
+    return rolling_mean(np.log(high / low)**2, window) / (4 * np.log(2))
+
+def garman_klass_variance(open_, high, low, close, window):
+    terms = 0.5 * np.log(high / low)**2 - (2 * np.log(2) - 1) * np.log(close / open_)**2
+    return rolling_mean(terms, window)
+
+def rogers_satchell_variance(open_, high, low, close, window):
+    return rolling_mean(_rogers_satchell_terms(open_, high, low, close), window)
+
+# Yang-Zhang: overnight variance + k * open-to-close variance + (1 - k) * Rogers-Satchell
+def yang_zhang_variance(open_, high, low, close, window):
+    overnight = np.log(open_[1:] / close[:-1])
+    open_to_close = np.log(close[1:] / open_[1:])
+    rogers_satchell = rolling_mean(_rogers_satchell_terms(open_[1:], high[1:], low[1:], close[1:]), window)
+    k = 0.34 / (1.34 + (window + 1) / (window - 1))
+    return _lagged(rolling_variance(overnight, window) + k * rolling_variance(open_to_close, window)
+                   + (1 - k) * rogers_satchell)
+
+def _rogers_satchell_terms(open_, high, low, close):
+    return np.log(high / close) * np.log(high / open_) + np.log(low / close) * np.log(low / open_)
+
+# Estimators built on returns have one row fewer than the bars; pad the first bar with NaN
+def _lagged(values):
+    return np.concatenate([np.full((1,) + values.shape[1:], np.nan), values])
+
+VOLATILITY_ESTIMATORS = {
+    'Close-to-Close': close_to_close_variance,
+    'Parkinson': parkinson_variance,
+    'Garman-Klass': garman_klass_variance,
+    'Rogers-Satchell': rogers_satchell_variance,
+    'Yang-Zhang': yang_zhang_variance,
+}
+
+# Annualized rolling volatility for (time x symbols) OHLC arrays
+def rolling_volatility(open_, high, low, close, window=20, estimator='Yang-Zhang', periods_per_year=252):
+    open_, high, low, close = (np.asarray(x, dtype=float) for x in (open_, high, low, close))
+    return np.sqrt(VOLATILITY_ESTIMATORS[estimator](open_, high, low, close, window) * periods_per_year)
+
+# Aligns the OHLC frames of several symbols on their dates into (time x symbols) arrays
+def stack_ohlc(frames):
+    stacked = pd.concat({symbol: frame.set_index('Date')[['Open', 'High', 'Low', 'Close']]
+                         for symbol, frame in frames.items() if not frame.empty}, axis=1).sort_index()
+    symbols = list(stacked.columns.get_level_values(0).unique())
+    return stacked.index, symbols, [stacked.xs(field, axis=1, level=1)[symbols].to_numpy(dtype=float)
+                                    for field in ('Open', 'High', 'Low', 'Close')]
+
+# Latest annualized volatility of every symbol under every estimator
+def historical_volatility_table(frames, window=20, periods_per_year=252):
+    if all(frame.empty for frame in frames.values()):
+        return pd.DataFrame(columns=list(VOLATILITY_ESTIMATORS), dtype=float)
+    _, symbols, (open_, high, low, close) = stack_ohlc(frames)
+    latest = {}
+    for name in VOLATILITY_ESTIMATORS:
+        vols = rolling_volatility(open_, high, low, close, window, name, periods_per_year)
+        # Last available value per symbol (histories may end on different dates)
+        latest[name] = pd.DataFrame(vols, columns=symbols).ffill().iloc[-1]
+    return pd.DataFrame(latest, index=symbols)
@@ -0,0 +1,50 @@
+# Leg-column memoization of memoized_evaluate_strategy on the adaptive price grid
+from unittest import mock
+
+import numpy as np
+
+import options_engine.caching as caching
+from options_engine.analytics import adaptive_grid_segments
+from options_engine.caching import LRUCache, memoized_evaluate_strategy
+from options_engine.strategies import evaluate_strategy, iron_condor_strategy
+
+T, R, SIGMA = 0.25, 0.05, 0.25
+PRICE_LEGS = caching.price_legs
+
+# Evaluates `strategy` on its adaptive grid around a spot of 100. Returns the grid
+# segments, the payoffs and the (points, strikes) of every price_legs call made.
+def evaluate(strategy, cache):
+    segments = adaptive_grid_segments(strategy, 100, T, SIGMA)
+    calls = []
+    def price_legs(asset_prices, strikes, *args):
+        calls.append((len(asset_prices), [float(strike) for strike in strikes]))
+        return PRICE_LEGS(asset_prices, strikes, *args)
+    with mock.patch.object(caching, 'price_legs', price_legs):
+        payoffs = memoized_evaluate_strategy(strategy, np.unique(np.concatenate(segments)), T, R, SIGMA, cache, segments)
+    return segments, payoffs, calls
+
+def condor(call_buy_strike=110, premium_put_buy=1.0):
+    return iron_condor_strategy(80, 90, 120, call_buy_strike, premium_put_buy, 2.0, 1.0, 2.0)
+
+def test_matches_evaluate_strategy():
+    segments, payoffs, calls = evaluate(condor(), LRUCache(512))
+    prices = np.unique(np.concatenate(segments))
+    np.testing.assert_allclose(payoffs, evaluate_strategy(condor(), prices, T, R, SIGMA), atol=1e-12)
+    assert calls == [(sum(map(len, segments)), [80.0, 90.0, 110.0, 120.0])]
+
+def test_moved_strike_prices_one_column():
+    cache = LRUCache(512)
+    evaluate(condor(), cache)
+    segments, payoffs, calls = evaluate(condor(call_buy_strike=112), cache)
+    prices = np.unique(np.concatenate(segments))
+    np.testing.assert_allclose(payoffs, evaluate_strategy(condor(call_buy_strike=112), prices, T, R, SIGMA), atol=1e-12)
+    # Segments are the spot's, then one per strike: the new strike is priced on every
+    # segment, the other strikes only on the new strike's segment
+    moved = segments[3]
+    assert calls == [(sum(map(len, segments)) - len(moved), [112.0]), (len(moved), [80.0, 90.0, 112.0, 120.0])]
+
+def test_premium_change_prices_nothing():
+    cache = LRUCache(512)
+    evaluate(condor(), cache)
+    _, _, calls = evaluate(condor(premium_put_buy=1.5), cache)
+    assert calls == []
@@ -0,0 +1,62 @@
+# Lattice engine against Black-Scholes and a plain single-spot CRR tree
+import numpy as np
+
+from options_engine.lattice import Lattice, escrowed_dividends, lattice_price
+from options_engine.pricing import black_scholes_call, black_scholes_put
+
+S = np.linspace(80, 120, 9)
+K, T, R, SIGMA = 100.0, 0.5, 0.05, 0.25
+STEPS = 1000
+
+# Reference Cox-Ross-Rubinstein tree rooted at the single spot S0
+def crr_price(S0, K, T, r, sigma, steps, option_type='put', american=True):
+    dt = T / steps
+    up = np.exp(sigma * np.sqrt(dt))
+    p = (np.exp(r * dt) - 1 / up) / (up - 1 / up)
+    discount = np.exp(-r * dt)
+    sign = 1.0 if option_type == 'call' else -1.0
+    values = np.maximum(sign * (S0 * up ** np.arange(steps, -steps - 1, -2) - K), 0.0)
+    for step in range(steps - 1, -1, -1):
+        values = discount * (p * values[:-1] + (1 - p) * values[1:])
+        if american:
+            values = np.maximum(values, sign * (S0 * up ** np.arange(step, -step - 1, -2) - K))
+    return values[0]
+
+def test_european_matches_black_scholes():
+    for method in ('binomial', 'trinomial'):
+        prices = lattice_price(S, [K, K], T, R, SIGMA, Lattice(method, STEPS, american=False), ['call', 'put'])
+        assert prices.shape == (len(S), 2)
+        np.testing.assert_allclose(prices[:, 0], black_scholes_call(S, K, T, R, SIGMA), atol=3e-3)
+        np.testing.assert_allclose(prices[:, 1], black_scholes_put(S, K, T, R, SIGMA), atol=3e-3)
+
+def test_american_put_matches_crr():
+    reference = np.array([crr_price(spot, K, T, R, SIGMA, 2 * STEPS) for spot in S])
+    for method in ('binomial', 'trinomial'):
+        prices = lattice_price(S, K, T, R, SIGMA, Lattice(method, STEPS), 'put')[:, 0]
+        np.testing.assert_allclose(prices, reference, atol=3e-3)
+        # Early exercise is worth something on a put with a positive rate
+        assert np.all(prices >= black_scholes_put(S, K, T, R, SIGMA) - 3e-3)
+
+def test_american_call_without_dividends_is_european():
+    american = lattice_price(S, K, T, R, SIGMA, Lattice('binomial', STEPS), 'call')
+    european = lattice_price(S, K, T, R, SIGMA, Lattice('binomial', STEPS, american=False), 'call')
+    np.testing.assert_allclose(american, european, atol=1e-10)
+
+def test_dividends():
+    dividends = ((0.2, 2.0),)
+    assert np.isclose(escrowed_dividends(dividends, 0.0, R, T), 2.0 * np.exp(-R * 0.2))
+    assert escrowed_dividends(dividends, 0.3, R, T) == 0.0
+    # A European call on a dividend payer is Black-Scholes on the spot less the escrowed dividend
+    european = lattice_price(S, K, T, R, SIGMA, Lattice('binomial', STEPS, american=False, dividends=dividends), 'call')[:, 0]
+    np.testing.assert_allclose(european, black_scholes_call(S - 2.0 * np.exp(-R * 0.2), K, T, R, SIGMA), atol=3e-3)
+    american = lattice_price(S, K, T, R, SIGMA, Lattice('binomial', STEPS, dividends=dividends), 'call')[:, 0]
+    assert np.all(american >= european)
+
+def test_expiry_layers_match_separate_trees():
+    expiries = np.array([[0.5], [0.25]])
+    lattice = Lattice('binomial', STEPS, american=False)
+    layers = lattice_price(S, K, expiries, R, SIGMA, lattice, 'put')
+    assert layers.shape == (2, len(S), 1)
+    np.testing.assert_allclose(layers[0], lattice_price(S, K, 0.5, R, SIGMA, lattice, 'put'), atol=1e-12)
+    # The shorter expiry is read from a tree with half the steps
+    np.testing.assert_allclose(layers[1, :, 0], black_scholes_put(S, K, 0.25, R, SIGMA), atol=3e-3)
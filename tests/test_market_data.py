@@ -0,0 +1,112 @@
+# Offline tests of the incremental market data store, against the CSV fixtures
+import os
+
+import pandas as pd
+import pytest
+
+from options_engine.market_data import MarketDataStore, MarketDataWarmer, OfflineProvider
+
+FIXTURE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'fixtures', 'market_data')
+
+# OfflineProvider that records the (symbol, start) of every request
+class RecordingProvider(OfflineProvider):
+    def __init__(self, fixture_dir):
+        super().__init__(fixture_dir)
+        self.requests = []
+
+    def fetch_bars(self, symbol, start, interval='1d'):
+        self.requests.append((symbol, pd.Timestamp(start).strftime('%Y-%m-%d')))
+        return super().fetch_bars(symbol, start, interval)
+
+def make_store(tmp_path, refresh_seconds):
+    provider = RecordingProvider(FIXTURE_DIR)
+    return MarketDataStore(str(tmp_path / 'bars.sqlite'), provider, refresh_seconds=refresh_seconds), provider
+
+def fixture_bars(symbol):
+    return pd.read_csv(os.path.join(FIXTURE_DIR, f'{symbol}.csv'), parse_dates=['Date'])
+
+def test_history_matches_fixture(tmp_path):
+    store, provider = make_store(tmp_path, refresh_seconds=300)
+    bars = store.get_history('AAPL', '2026-01-01')
+    expected = fixture_bars('AAPL')
+    expected = expected[expected['Date'] >= '2026-01-01'].reset_index(drop=True)
+    assert provider.requests == [('AAPL', '2026-01-01')]
+    pd.testing.assert_frame_equal(bars, expected, check_dtype=False)
+
+def test_no_refetch_within_refresh_window(tmp_path):
+    store, provider = make_store(tmp_path, refresh_seconds=300)
+    store.get_history('AAPL', '2026-01-01')
+    store.get_history('AAPL', '2026-01-01')
+    # A narrower window is covered by what is already stored
+    store.get_history('AAPL', '2026-06-01')
+    assert provider.requests == [('AAPL', '2026-01-01')]
+
+def test_refetch_starts_at_last_stored_date(tmp_path):
+    store, provider = make_store(tmp_path, refresh_seconds=0)
+    first = store.get_history('AAPL', '2026-01-01')
+    second = store.get_history('AAPL', '2026-01-01')
+    last_date = fixture_bars('AAPL')['Date'].iloc[-1].strftime('%Y-%m-%d')
+    assert provider.requests == [('AAPL', '2026-01-01'), ('AAPL', last_date)]
+    pd.testing.assert_frame_equal(first, second)
+
+def test_wider_window_refetches_history(tmp_path):
+    store, provider = make_store(tmp_path, refresh_seconds=300)
+    store.get_history('AAPL', '2026-01-01')
+    bars = store.get_history('AAPL', '2025-01-01')
+    assert provider.requests == [('AAPL', '2026-01-01'), ('AAPL', '2025-01-01')]
+    assert bars['Date'].iloc[0] >= pd.Timestamp('2025-01-01')
+    assert bars['Date'].iloc[0] < pd.Timestamp('2025-01-10')
+    # The wider window is now the one on record
+    store.get_history('AAPL', '2025-06-01')
+    assert len(provider.requests) == 2
+
+def test_latest_close(tmp_path):
+    store, _ = make_store(tmp_path, refresh_seconds=300)
+    assert store.latest_close('AAPL') is None
+    store.get_history('AAPL', '2026-01-01')
+    assert store.latest_close('AAPL') == pytest.approx(fixture_bars('AAPL')['Close'].iloc[-1])
+    assert store.latest_close('MSFT') is None
+
+def test_unknown_symbol_is_empty(tmp_path):
+    store, _ = make_store(tmp_path, refresh_seconds=300)
+    assert store.get_history('NOPE', '2026-01-01').empty
+
+# Provider whose downloads fail the way yfinance's do: no exception, just no bars
+class EmptyProvider(RecordingProvider):
+    def fetch_bars(self, symbol, start, interval='1d'):
+        super().fetch_bars(symbol, start, interval)
+        return pd.DataFrame(columns=['Date', 'Open', 'High', 'Low', 'Close'])
+
+def test_failed_download_is_not_recorded(tmp_path):
+    path = str(tmp_path / 'bars.sqlite')
+    failing = EmptyProvider(FIXTURE_DIR)
+    store = MarketDataStore(path, failing, refresh_seconds=300)
+    assert store.get_history('AAPL', '2026-01-01').empty
+    assert store.get_history('AAPL', '2026-01-01').empty
+    # Every call retries the download instead of treating the window as covered
+    assert failing.requests == [('AAPL', '2026-01-01'), ('AAPL', '2026-01-01')]
+
+    provider = RecordingProvider(FIXTURE_DIR)
+    store = MarketDataStore(path, provider, refresh_seconds=300)
+    assert not store.get_history('AAPL', '2026-01-01').empty
+    assert provider.requests == [('AAPL', '2026-01-01')]
+
+def test_warmer_retries_empty_history(tmp_path):
+    failing = EmptyProvider(FIXTURE_DIR)
+    warmer = MarketDataWarmer(MarketDataStore(str(tmp_path / 'bars.sqlite'), failing), ['AAPL'], retries=2, retry_delay=0.0)
+    warmer.refresh()
+    _, report = warmer.report()
+    assert warmer.get('AAPL') is None
+    assert len(failing.requests) == 3
+    assert report.loc[0, 'attempts'] == 3
+    assert report.loc[0, 'status'].startswith('failed')
+
+def test_warmer_loads_symbols(tmp_path):
+    # A lookback long enough to cover the fixtures whatever today's date
+    warmer = MarketDataWarmer(MarketDataStore(str(tmp_path / 'bars.sqlite'), OfflineProvider(FIXTURE_DIR)), ['AAPL', 'MSFT'],
+                              lookback_months=1200)
+    warmer.refresh()
+    _, report = warmer.report()
+    assert list(report['status']) == ['ok', 'ok']
+    assert (report['attempts'] == 1).all()
+    assert len(warmer.get('MSFT')) == report.loc[1, 'rows'] > 0
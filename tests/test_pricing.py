@@ -0,0 +1,39 @@
+# Round trip of implied_volatility over a random Black-Scholes chain
+import numpy as np
+
+from options_engine.pricing import black_scholes_batch, black_scholes_greeks, implied_volatility
+
+# Random chain of calls and puts around a spot of 100
+def random_chain(n=2000, seed=7):
+    rng = np.random.default_rng(seed)
+    S = np.full(n, 100.0)
+    K = rng.uniform(50, 150, n)
+    T = rng.uniform(0.02, 2.0, n)
+    r = rng.uniform(0.0, 0.08, n)
+    sigma = rng.uniform(0.05, 1.5, n)
+    option_type = np.where(rng.random(n) < 0.5, 'call', 'put')
+    calls, puts = black_scholes_batch(S, K, T, r, sigma)[:2]
+    prices = np.where(option_type == 'call', calls, puts)
+    return prices, S, K, T, r, sigma, option_type
+
+def test_recovers_chain_vols():
+    prices, S, K, T, r, sigma, option_type = random_chain()
+    vols, converged = implied_volatility(prices, S, K, T, r, option_type)
+    assert vols.shape == converged.shape == prices.shape
+    # Deep in- or out-of-the-money entries carry no vol information in double precision
+    sensitive = black_scholes_greeks(S, K, T, r, sigma)['vega'][0] > 1e-2
+    assert sensitive.mean() > 0.8
+    assert converged[sensitive].all()
+    np.testing.assert_allclose(vols[sensitive], sigma[sensitive], atol=1e-6)
+
+def test_outside_no_arbitrage_bounds():
+    S, K, T, r = 100.0, 90.0, 0.5, 0.05
+    floor = S - K * np.exp(-r * T)
+    prices = np.array([floor - 1.0, S + 1.0, 5.0, -1.0, 10.0])
+    option_type = np.array(['call', 'call', 'put', 'put', 'call'])
+    expiries = np.array([T, T, T, T, 0.0])
+    vols, converged = implied_volatility(prices, S, K, expiries, r, option_type)
+    # A put at 5 on these terms is inside the bounds; the rest are not (or have expired)
+    assert np.isnan(vols[[0, 1, 3, 4]]).all()
+    assert not converged[[0, 1, 3, 4]].any()
+    assert converged[2] and np.isfinite(vols[2])